@@ -22,6 +22,7 @@ from src.utils import logger, config, ensure_dir_exists, InteractiveConfig, get_
 from src.core.dataGenerator import main as generate_data
 from src.core.dataAugmentation import main as augment_data
 from src.core.create_dataset import main as create_lmdb
+from src.core.run_journal import RunJournal
 
 def setup_directories():
     """创建必要的输出目录"""
@@ -40,6 +41,32 @@ def setup_directories():
     
     logger.info("目录创建完成")
 
+# 可在命令行覆盖的增强参数，与配置 augmentation.params 中的键同名
+AUGMENTATION_ARGS = ('rotation_range', 'noise_level', 'blur_kernel', 'brightness', 'contrast')
+
+def augmentation_params(args=None):
+    """增强参数：配置 augmentation.params，命令行指定的值优先"""
+    params = dict(config.get('augmentation.params', None) or {})
+    for key in AUGMENTATION_ARGS:
+        value = getattr(args, key, None)
+        if value is not None:
+            params[key] = value
+    probability = getattr(args, 'aug_probability', None)
+    if probability is not None:
+        params['probability'] = probability
+    return params
+
+def add_augmentation_arguments(parser):
+    """增强参数的命令行选项（默认取配置 augmentation.params）"""
+    group = parser.add_argument_group('数据增强参数（默认取配置 augmentation.params）')
+    group.add_argument('--rotation-range', type=float, nargs=2, metavar=('MIN', 'MAX'), help='旋转角度范围（度）')
+    group.add_argument('--noise-level', type=float, nargs=2, metavar=('MIN', 'MAX'), help='噪声强度范围 0-1')
+    group.add_argument('--blur-kernel', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                       help='高斯模糊核大小范围（取其中的奇数，1 表示不模糊）')
+    group.add_argument('--brightness', type=float, nargs=2, metavar=('MIN', 'MAX'), help='亮度倍数范围')
+    group.add_argument('--contrast', type=float, nargs=2, metavar=('MIN', 'MAX'), help='对比度倍数范围')
+    group.add_argument('--aug-probability', type=float, default=None, help='每种增强被选中的概率（默认1/6）')
+
 def cmd_generate(args):
     """执行数据生成"""
     logger.info("开始生成身份证数据...")
@@ -47,20 +74,88 @@ def cmd_generate(args):
     
     # 调用数据生成模块
     try:
-        generate_data()
+        params = dict(sample_sum=getattr(args, 'samples', None) or config.get('dataset.total_samples', 10000),
+                      batch_size=getattr(args, 'batch_size', None) or config.get('dataset.batch_size', 1000),
+                      output_dir=str(config.get_output_dir()),
+                      fragment_IDcard=getattr(args, 'fragment', False),
+                      engine=getattr(args, 'engine', 'pil'),
+                      codec=getattr(args, 'codec', 'png'),
+                      compress_level=getattr(args, 'compress_level', 6),
+                      output=getattr(args, 'output', 'files'),
+                      lmdb_path=getattr(args, 'lmdb_path', None),
+                      shard_dir=getattr(args, 'shard_dir', None),
+                      shard_size=getattr(args, 'shard_size', 10000),
+                      files_per_dir=getattr(args, 'files_per_dir', 1000),
+                      seed=getattr(args, 'seed', None),
+                      shard=getattr(args, 'shard', None),
+                      augmentation=augmentation_params(args))
+        run_dir = getattr(args, 'run_dir', None)
+        if params['shard'] is not None:
+            if params['output'] not in ('lmdb', 'tar'):
+                # 散文件输出没有合并步骤，多个分片会互相覆盖同一目录下的标注和清单
+                logger.error("--shard 只支持 --output lmdb 或 tar")
+                return False
+            # 同一台机器上运行多个分片时，默认输出和运行目录按分片区分
+            suffix = '-shard{}of{}'.format(*params['shard'])
+            for key in ('lmdb_path', 'shard_dir'):
+                if params[key] is not None:
+                    params[key] += suffix
+            if run_dir is not None:
+                run_dir += suffix
+        resume = getattr(args, 'resume', False)
+        if resume:
+            if run_dir is None:
+                logger.error("--resume 需要指定 --run-dir")
+                return False
+            # 续跑沿用原运行记录的参数
+            journal = RunJournal(run_dir)
+            if not journal.exists():
+                logger.error(f"运行目录中没有可续跑的记录: {run_dir}")
+                return False
+            params.update(journal.load()[0])
+            logger.info(f"从运行目录续跑: {run_dir}")
+        generate_data(workers=getattr(args, 'workers', 1), run_dir=run_dir, resume=resume, **params)
         logger.info("数据生成完成")
     except Exception as e:
         logger.error(f"数据生成失败: {e}")
         return False
     return True
 
+def cmd_merge(args):
+    """合并多个分片的 LMDB 或 tar 输出"""
+    from src.core.create_dataset import mergeLmdb
+    from src.core.sinks import merge_tar_shards
+    logger.info(f"开始合并 {len(args.inputs)} 个分片输出...")
+    try:
+        if args.format == 'lmdb':
+            count = mergeLmdb(args.inputs, args.output)
+        else:
+            count = merge_tar_shards(args.inputs, args.output, args.shard_size)
+        logger.info(f"合并完成，共 {count} 个样本: {args.output}")
+    except Exception as e:
+        logger.error(f"合并失败: {e}")
+        return False
+    return True
+
+def parse_shard(text):
+    """解析 K/N 形式的分片参数"""
+    try:
+        k, n = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片参数应为 K/N 形式: {text}")
+    if not 0 <= k < n:
+        raise argparse.ArgumentTypeError(f"分片序号应满足 0 <= K < N: {text}")
+    return k, n
+
 def cmd_augment(args):
     """执行数据增强"""
     logger.info("开始数据增强...")
     setup_directories()
     
     try:
-        augment_data()
+        augment_data(input_path=str(config.get_output_dir() / 'images'),
+                     output_path=str(config.get_augmented_dir() / 'images'),
+                     augmentation=augmentation_params(args))
         logger.info("数据增强完成")
     except Exception as e:
         logger.error(f"数据增强失败: {e}")
@@ -73,7 +168,9 @@ def cmd_create_dataset(args):
     setup_directories()
     
     try:
-        create_lmdb()
+        create_lmdb(train_ratio=config.get('dataset.train_ratio', 0.8),
+                    dataPath=str(config.get_output_dir() / 'images'),
+                    outputDir=str(config.get_lmdb_dir()))
         logger.info("LMDB数据集创建完成")
     except Exception as e:
         logger.error(f"LMDB数据集创建失败: {e}")
@@ -204,8 +301,11 @@ def cmd_generate_with_config(user_config):
     """使用用户配置生成数据"""
     setup_directories()
     try:
-        # 这里可以传递用户配置到生成函数
-        generate_data()
+        # 用户配置已写入 config（见 apply_interactive_config），按配置的样本数分批生成
+        generate_data(sample_sum=config.get('dataset.total_samples', 10000),
+                      batch_size=config.get('dataset.batch_size', 1000),
+                      output_dir=str(config.get_output_dir()),
+                      augmentation=augmentation_params())
         logger.info("数据生成完成")
         return True
     except Exception as e:
@@ -215,7 +315,9 @@ def cmd_generate_with_config(user_config):
 def cmd_augment_with_config(user_config):
     """使用用户配置进行数据增强"""
     try:
-        augment_data()
+        augment_data(input_path=str(config.get_output_dir() / 'images'),
+                     output_path=str(config.get_augmented_dir() / 'images'),
+                     augmentation=augmentation_params())
         logger.info("数据增强完成")
         return True
     except Exception as e:
@@ -225,13 +327,20 @@ def cmd_augment_with_config(user_config):
 def cmd_create_dataset_with_config(user_config):
     """使用用户配置创建数据集"""
     try:
-        create_lmdb()
+        create_lmdb(train_ratio=config.get('dataset.train_ratio', 0.8),
+                    dataPath=str(config.get_output_dir() / 'images'),
+                    outputDir=str(config.get_lmdb_dir()))
         logger.info("LMDB数据集创建完成")
         return True
     except Exception as e:
         logger.error(f"LMDB数据集创建失败: {e}")
         return False
 
+def cmd_benchmark(args):
+    """比较输出编码格式的吞吐与文件大小"""
+    from src.core.dataGenerator import codec_benchmark
+    codec_benchmark(sample_sum=args.samples, engine=args.engine, workers=args.threads)
+
 def cmd_info(args):
     """显示配置信息"""
     logger.info("=== 配置信息 ===")
@@ -251,10 +360,20 @@ def main():
         epilog="""
 使用示例:
   python main.py interactive  # 交互式模式（推荐）
-  python main.py generate     # 生成身份证数据
+  python main.py generate     # 按配置的样本数和批次大小生成身份证数据
+  python main.py generate --samples 100000 --batch-size 2000  # 指定样本数和批次大小
+  python main.py generate --workers 8  # 使用8个进程并行渲染
+  python main.py generate --fragment --output lmdb  # 切片直接写入LMDB
+  python main.py generate --fragment --output tar   # 切片写入tar分片
+  python main.py generate --run-dir output/data/run  # 记录检查点，可中断续跑
+  python main.py generate --resume --run-dir output/data/run  # 从上次中断处继续生成
+  python main.py generate --output lmdb --seed 1 --shard 0/4  # 多机生成第0个分片
+  python main.py merge --format lmdb -o merged a b c d  # 合并分片输出
   python main.py augment      # 数据增强
+  python main.py augment --rotation-range -3 3 --blur-kernel 1 5  # 覆盖配置中的增强参数
   python main.py dataset      # 创建LMDB数据集
   python main.py pipeline     # 执行完整流水线
+  python main.py benchmark    # 比较输出编码格式
   python main.py info         # 显示配置信息
         """
     )
@@ -267,10 +386,54 @@ def main():
     
     # 生成数据命令
     parser_generate = subparsers.add_parser('generate', help='生成身份证数据')
+    parser_generate.add_argument('--fragment', action='store_true', help='输出字段切片（按字段直接渲染）而非整张身份证')
+    parser_generate.add_argument('--samples', type=int, default=None,
+                                 help='生成样本数量（默认取配置 dataset.total_samples）')
+    parser_generate.add_argument('--batch-size', type=int, default=None,
+                                 help='每批生成的样本数，内存占用与批次大小有关、与样本总数无关'
+                                      '（默认取配置 dataset.batch_size）')
+    parser_generate.add_argument('--workers', type=int, default=1, help='并行渲染进程数（默认1）')
+    parser_generate.add_argument('--engine', choices=['pil', 'atlas'], default='pil',
+                                 help='渲染引擎：pil 逐字渲染，atlas 使用预光栅化字形图集（默认pil）')
+    parser_generate.add_argument('--codec', choices=['png', 'webp', 'npy'], default='png',
+                                 help='输出编码格式：png、无损webp或原始npy数组（默认png）')
+    parser_generate.add_argument('--compress-level', type=int, default=6, choices=range(10), metavar='0-9',
+                                 help='png/webp 压缩级别（默认6）')
+    parser_generate.add_argument('--output', choices=['files', 'lmdb', 'tar'], default='files',
+                                 help='输出方式：files 图片目录+标注文件，lmdb 直接写入LMDB，'
+                                      'tar WebDataset风格tar分片（默认files）')
+    parser_generate.add_argument('--lmdb-path', default=str(config.get_lmdb_dir() / 'generated'),
+                                 help='--output lmdb 时的LMDB输出路径（默认 LMDB目录下的 generated）')
+    parser_generate.add_argument('--shard-dir', default=str(config.get_output_dir() / 'shards'),
+                                 help='--output tar 时的分片输出目录（默认 输出目录下的 shards）')
+    parser_generate.add_argument('--shard-size', type=int, default=10000,
+                                 help='--output tar 时每个分片的样本数（默认10000）')
+    parser_generate.add_argument('--files-per-dir', type=int, default=1000,
+                                 help='--output files 时每个子目录的文件数，0 表示不分子目录（默认1000）')
+    parser_generate.add_argument('--seed', type=int, default=None,
+                                 help='主种子；相同种子和参数的输出可逐字节复现，与进程数无关（默认随机）')
+    parser_generate.add_argument('--shard', type=parse_shard, default=None, metavar='K/N',
+                                 help='只生成全局样本序号空间中第K个（共N个）互不相交的分片（仅 --output lmdb/tar），'
+                                      '输出和运行目录自动加上分片后缀；各节点需使用相同的 --seed')
+    parser_generate.add_argument('--run-dir', default=None,
+                                 help='运行目录，记录每个批次完成后的检查点（并将输出同步落盘），'
+                                      '之后可用 --resume 续跑；默认不记录')
+    parser_generate.add_argument('--resume', action='store_true',
+                                 help='按运行目录中的检查点续跑，跳过已完成的批次（沿用原运行的参数）')
+    add_augmentation_arguments(parser_generate)
     parser_generate.set_defaults(func=cmd_generate)
     
+    # 合并分片命令
+    parser_merge = subparsers.add_parser('merge', help='合并多个分片的LMDB或tar输出（重新编号，不解码图片）')
+    parser_merge.add_argument('inputs', nargs='+', help='按分片序号排列的输入LMDB路径或tar分片目录')
+    parser_merge.add_argument('-o', '--output', required=True, help='合并后的输出路径')
+    parser_merge.add_argument('--format', choices=['lmdb', 'tar'], default='lmdb', help='输出格式（默认lmdb）')
+    parser_merge.add_argument('--shard-size', type=int, default=10000, help='tar 格式合并后每个分片的样本数（默认10000）')
+    parser_merge.set_defaults(func=cmd_merge)
+    
     # 数据增强命令
     parser_augment = subparsers.add_parser('augment', help='执行数据增强')
+    add_augmentation_arguments(parser_augment)
     parser_augment.set_defaults(func=cmd_augment)
     
     # 创建数据集命令
@@ -279,8 +442,28 @@ def main():
     
     # 完整流水线命令
     parser_pipeline = subparsers.add_parser('pipeline', help='执行完整流水线')
+    parser_pipeline.add_argument('--fragment', action='store_true', help='输出字段切片（按字段直接渲染）而非整张身份证')
+    parser_pipeline.add_argument('--samples', type=int, default=None,
+                                 help='生成样本数量（默认取配置 dataset.total_samples）')
+    parser_pipeline.add_argument('--batch-size', type=int, default=None,
+                                 help='每批生成的样本数（默认取配置 dataset.batch_size）')
+    parser_pipeline.add_argument('--workers', type=int, default=1, help='并行渲染进程数（默认1）')
+    parser_pipeline.add_argument('--engine', choices=['pil', 'atlas'], default='pil',
+                                 help='渲染引擎：pil 逐字渲染，atlas 使用预光栅化字形图集（默认pil）')
+    parser_pipeline.add_argument('--codec', choices=['png', 'webp', 'npy'], default='png',
+                                 help='输出编码格式：png、无损webp或原始npy数组（默认png）')
+    parser_pipeline.add_argument('--compress-level', type=int, default=6, choices=range(10), metavar='0-9',
+                                 help='png/webp 压缩级别（默认6）')
+    add_augmentation_arguments(parser_pipeline)
     parser_pipeline.set_defaults(func=cmd_pipeline)
     
+    # 编码格式基准测试命令
+    parser_benchmark = subparsers.add_parser('benchmark', help='比较输出编码格式的吞吐与文件大小')
+    parser_benchmark.add_argument('--samples', type=int, default=50, help='用于测试的身份证数量（默认50）')
+    parser_benchmark.add_argument('--engine', choices=['pil', 'atlas'], default='pil', help='渲染引擎（默认pil）')
+    parser_benchmark.add_argument('--threads', type=int, default=1, help='编码线程数（默认1）')
+    parser_benchmark.set_defaults(func=cmd_benchmark)
+    
     # 信息命令
     parser_info = subparsers.add_parser('info', help='显示配置信息')
     parser_info.set_defaults(func=cmd_info)
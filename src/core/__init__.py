@@ -8,5 +8,15 @@
 from . import dataGenerator
 from . import dataAugmentation  
 from . import create_dataset
+from . import record
+from . import resource_cache
+from . import glyph_atlas
+from . import pipeline
+from . import image_writer
+from . import sinks
+from . import manifest
+from . import annotation_writer
+from . import run_journal
+from . import seeding
 
-__all__ = ["dataGenerator", "dataAugmentation", "create_dataset"] 
\ No newline at end of file
+__all__ = ["dataGenerator", "dataAugmentation", "create_dataset", "record", "resource_cache", "glyph_atlas", "pipeline", "image_writer", "sinks", "manifest", "annotation_writer", "run_journal", "seeding"] 
\ No newline at end of file
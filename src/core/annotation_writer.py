@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+标注写入模块
+
+标注行边生成边写入磁盘，不在内存中累积。写入目标是 <path>.partial：
+每 flush_every 行刷新一次缓冲区，每 fsync_every 行做一次 fsync 检查点，
+正常结束时再原子地重命名为 <path>。进程中途崩溃时，最后一个检查点
+之前的标注保留在 .partial 文件中，之后以追加模式打开即可继续写入。
+"""
+
+import os
+
+PARTIAL_SUFFIX = '.partial'
+
+
+class AnnotationWriter:
+    """流式、可追加、崩溃安全的标注写入器
+
+    Args:
+        path: 最终的标注文件路径，如 data/annotations/data.txt
+        mode: 'w' 新建；'a' 在已有标注之后追加（优先接续未完成的 .partial）
+        flush_every: 每写入多少行刷新一次缓冲区
+        fsync_every: 每写入多少行做一次 fsync 检查点
+        truncate_to: 追加模式下先把已有标注截断到该字节数（检查点返回值），
+            丢弃检查点之后写入的部分
+    """
+
+    def __init__(self, path, mode='w', flush_every=1000, fsync_every=10000, truncate_to=None):
+        if mode not in ('w', 'a'):
+            raise ValueError('mode 只能为 w 或 a: {}'.format(mode))
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.flush_every = flush_every
+        self.fsync_every = fsync_every
+        if mode == 'a' and not os.path.exists(self.partial_path) and os.path.exists(path):
+            # 接着已完成的标注写：先原子地移回 .partial，结束时再换回来
+            os.replace(path, self.partial_path)
+        self._file = open(self.partial_path, mode + 'b')
+        if mode == 'a' and truncate_to is not None:
+            self._file.truncate(truncate_to)
+            self._file.seek(truncate_to)
+        self.lines = 0
+        self._unflushed = 0
+        self._unsynced = 0
+
+    def write(self, line):
+        """写入一行（或多行）标注文本"""
+        self._file.write(line.encode('utf-8'))
+        self.lines += 1
+        self._unflushed += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.checkpoint()
+        elif self._unflushed >= self.flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def checkpoint(self):
+        """把已写入的标注持久化到磁盘，返回当前文件字节数"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+        self._unsynced = 0
+        return self._file.tell()
+
+    def close(self):
+        """写完全部标注：检查点后原子地重命名为最终文件"""
+        if self._file.closed:
+            return
+        self.checkpoint()
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """异常结束：持久化已写入部分并保留 .partial，供追加模式接续"""
+        if self._file.closed:
+            return
+        self.checkpoint()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
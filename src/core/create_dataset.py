@@ -7,13 +7,14 @@ import lmdb  # install lmdb by "pip install lmdb"
 import cv2
 import numpy as np
 from ..data.dictionary import alphabet
+from .manifest import Manifest, MANIFEST_NAME
 
 
 # 检查图片是否有效
 def checkImageIsValid(imageBin):
     if imageBin is None:
         return False
-    imageBuf = np.fromstring(imageBin, dtype=np.uint8)
+    imageBuf = np.frombuffer(imageBin, dtype=np.uint8)
     img = cv2.imdecode(imageBuf, cv2.IMREAD_GRAYSCALE)
     if img is None:
         return False
@@ -75,6 +76,121 @@ def createDataset(outputPath, dataList, checkValid=True):
     print('Created dataset with %d samples' % nSamples)
 
 
+class LmdbSink:
+    """直接写入LMDB的样本接收器
+
+    生成器编码好的切片和标注直接追加到LMDB环境中，不再经过磁盘上的
+    中间PNG文件。键布局与 createDataset 相同：image-%09d / label-%09d
+    （从1开始）以及 num-samples。样本按条数或字节数攒成大事务提交，
+    映射空间不足时自动扩容后重试。只有正常结束（close）时才写入
+    num-samples；异常退出（abort）时只提交已缓存的样本，没有 num-samples
+    的LMDB即为未完成的数据集，可以续跑。
+    """
+
+    def __init__(self, output_path, map_size=1073741824, commit_interval=10000, commit_bytes=256 * 1048576,
+                 resume_state=None):
+        self.output_path = output_path
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        self.env = lmdb.open(output_path, map_size=map_size)
+        self.commit_interval = commit_interval
+        self.commit_bytes = commit_bytes
+        self.cache = {}
+        self.cache_bytes = 0
+        self.count = 0
+        if resume_state is not None:
+            self.count = resume_state['count']
+            self._drop_after(self.count)
+
+    def _drop_after(self, count):
+        """删除序号大于 count 的样本（续跑时丢弃检查点之后写入的部分）和 num-samples"""
+        with self.env.begin(write=True) as txn:
+            txn.delete(b'num-samples')
+            for prefix in (b'image-', b'label-'):
+                cursor = txn.cursor()
+                if cursor.set_range(prefix + b'%09d' % (count + 1)):
+                    while cursor.key().startswith(prefix):
+                        if not cursor.delete():
+                            break
+
+    def add(self, file_name, data, label):
+        """追加一个样本；file_name 仅为与其他接收器接口一致，不写入LMDB"""
+        self.count += 1
+        self.cache['image-%09d' % self.count] = data
+        self.cache['label-%09d' % self.count] = label.encode()
+        self.cache_bytes += len(data)
+        if len(self.cache) >= 2 * self.commit_interval or self.cache_bytes >= self.commit_bytes:
+            self.flush()
+
+    def flush(self):
+        """提交缓存中的样本"""
+        while True:
+            try:
+                writeCache(self.env, self.cache)
+                break
+            except lmdb.MapFullError:
+                self.env.set_mapsize(self.env.info()['map_size'] * 2)
+        self.cache = {}
+        self.cache_bytes = 0
+
+    def checkpoint(self):
+        """提交缓存中的样本，返回续跑用的状态"""
+        self.flush()
+        return {'count': self.count}
+
+    def close(self):
+        """写入 num-samples 并关闭环境"""
+        self.cache['num-samples'] = str(self.count).encode()
+        self.flush()
+        self.env.close()
+        print('Created dataset with %d samples' % self.count)
+
+    def abort(self):
+        """异常结束：提交已缓存的样本后关闭环境，不写 num-samples"""
+        self.flush()
+        self.env.close()
+        print('Aborted after %d samples; dataset is incomplete' % self.count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def mergeLmdb(inputPaths, outputPath):
+    """按顺序合并多个LMDB数据集（如多机分片生成的输出）
+
+    样本按输入顺序重新编号为 image-%09d / label-%09d，并写入合并后的
+    num-samples。图片直接按字节复制，不做解码和校验。没有 num-samples
+    的输入（未正常结束的生成）会被拒绝。
+
+    Args:
+        inputPaths: 输入LMDB路径列表，按分片序号排列
+        outputPath: 合并后的LMDB输出路径
+
+    Returns:
+        合并后的样本数
+    """
+    with LmdbSink(outputPath) as sink:
+        for inputPath in inputPaths:
+            env = lmdb.open(inputPath, readonly=True, lock=False)
+            with env.begin() as txn:
+                nSamples = txn.get(b'num-samples')
+                if nSamples is None:
+                    env.close()
+                    raise ValueError('%s 没有 num-samples，不是完整的数据集（生成未正常结束？）' % inputPath)
+                nSamples = int(nSamples)
+                print('Merging %s: %d samples' % (inputPath, nSamples))
+                for i in range(1, nSamples + 1):
+                    sink.add(None, txn.get(b'image-%09d' % i), txn.get(b'label-%09d' % i).decode())
+            env.close()
+    return sink.count
+
+
 def readDataset(datasetPath):
     with lmdb.open(datasetPath) as env:
         txn = env.begin()
@@ -117,19 +233,57 @@ def outputLmdb(inputPath, outputPath, dataPath):
     createDataset(outputPath, imgLabelListSort, checkValid=True)
 
 
-def main():
-    """主函数：创建LMDB数据集"""
+def manifestToLmdb(manifestPath, outputPath, start=0, stop=None):
+    """按清单创建LMDB数据集，不扫描图片目录
+
+    Args:
+        manifestPath: 清单文件路径或其所在目录
+        outputPath: LMDB输出路径
+        start, stop: 使用清单中 [start, stop) 范围的样本
+    """
+    manifest = Manifest(manifestPath)
+    stop = len(manifest) if stop is None else stop
+    imgLabelList = [(manifest.full_path(i), manifest.label_at(i)) for i in range(start, stop)]
+
+    ##sort by labelList
+    imgLabelListSort = sorted(imgLabelList, key=lambda x: len(x[1]))
+
+    createDataset(outputPath, imgLabelListSort, checkValid=True)
+
+
+def main(train_ratio=0.8, dataPath='./data/images/', outputDir='./lmdb'):
+    """主函数：创建LMDB数据集
+
+    图片目录中有清单（manifest.npz）时按清单前 train_ratio 的样本作为
+    训练集、其余作为验证集；否则读取与图片目录同级的 annotations 目录下的
+    mini_train.txt / mini_val.txt。
+
+    Args:
+        train_ratio: 训练集比例
+        dataPath: 图片目录
+        outputDir: lmdb 输出目录
+    """
     # lmdb 输出目录
-    train_outputPath = './lmdb/mini_train'
-    val_outputPath = './lmdb/mini_val'
-    train_inputPath = './data/annotations/mini_train.txt'
-    val_inputPath = './data/annotations/mini_val.txt'
-    dataPath = './data/images/'
+    train_outputPath = os.path.join(outputDir, 'mini_train')
+    val_outputPath = os.path.join(outputDir, 'mini_val')
+    annotationsPath = os.path.join(os.path.dirname(os.path.normpath(dataPath)), 'annotations')
+    train_inputPath = os.path.join(annotationsPath, 'mini_train.txt')
+    val_inputPath = os.path.join(annotationsPath, 'mini_val.txt')
 
     # 确保输出目录存在
     os.makedirs(os.path.dirname(train_outputPath), exist_ok=True)
     os.makedirs(os.path.dirname(val_outputPath), exist_ok=True)
 
+    manifestPath = os.path.join(dataPath, MANIFEST_NAME)
+    if os.path.exists(manifestPath):
+        nSamples = len(Manifest(manifestPath))
+        nTrain = int(nSamples * train_ratio)
+        print("开始按清单创建LMDB数据集...")
+        manifestToLmdb(manifestPath, train_outputPath, 0, nTrain)
+        manifestToLmdb(manifestPath, val_outputPath, nTrain, nSamples)
+        print("LMDB数据集创建完成")
+        return
+
     # 检查输入文件是否存在
     if not os.path.exists(train_inputPath):
         print(f"警告: 训练集标注文件不存在: {train_inputPath}")
@@ -140,8 +294,8 @@ def main():
         return
 
     print("开始创建LMDB数据集...")
-    outputLmdb(train_inputPath, train_outputPath, dataPath)
-    outputLmdb(val_inputPath, val_outputPath, dataPath)
+    outputLmdb(train_inputPath, train_outputPath, os.path.join(dataPath, ''))
+    outputLmdb(val_inputPath, val_outputPath, os.path.join(dataPath, ''))
     print("LMDB数据集创建完成")
 
 if __name__ == '__main__':
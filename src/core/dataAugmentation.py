@@ -1,8 +1,12 @@
 import numpy as np
-import random
 import cv2
 from PIL import Image
+import json
 import os
+from functools import partial
+from .image_writer import ImageWriter, DEFAULT_COMPRESS_LEVEL
+from .manifest import Manifest, ManifestWriter, MANIFEST_NAME
+from .seeding import make_master_seed, make_rng, AUGMENT
 GammaCorrection_LookUpTable = {
     '0.2': [0, 84, 96, 104, 111, 116, 120, 124, 127, 130, 133, 135, 138, 140, 142, 144, 146, 148, 150, 151, 153, 154, 156, 157, 158, 160, 161, 162, 163, 165, 166, 167, 168, 169, 170, 171, 172, 173, 174, 175, 176, 176, 177, 178, 179, 180, 181, 181, 182, 183, 184, 184, 185, 186, 186, 187, 188, 188, 189, 190, 190, 191, 192, 192, 193, 194, 194, 195, 195, 196, 196, 197, 198, 198, 199, 199, 200, 200, 201, 201, 202, 202, 203, 203, 204, 204, 205, 205, 206, 206, 207, 207, 207, 208, 208, 209, 209, 210, 210, 211, 211, 211, 212, 212, 213, 213, 213, 214, 214, 215, 215, 215, 216, 216, 217, 217, 217, 218, 218, 218, 219, 219, 220, 220, 220, 221, 221, 221, 222, 222, 222, 223, 223, 223, 224, 224, 224, 225, 225, 225, 226, 226, 226, 227, 227, 227, 228, 228, 228, 229, 229, 229, 229, 230, 230, 230, 231, 231, 231, 232, 232, 232, 232, 233, 233, 233, 234, 234, 234, 234, 235, 235, 235, 235, 236, 236, 236, 237, 237, 237, 237, 238, 238, 238, 238, 239, 239, 239, 239, 240, 240, 240, 240, 241, 241, 241, 241, 242, 242, 242, 242, 243, 243, 243, 243, 244, 244, 244, 244, 245, 245, 245, 245, 245, 246, 246, 246, 246, 247, 247, 247, 247, 248, 248, 248, 248, 248, 249, 249, 249, 249, 250, 250, 250, 250, 250, 251, 251, 251, 251, 251, 252, 252, 252, 252, 252, 253, 253, 253, 253, 253, 254, 254, 254, 254, 255],
     '0.4': [0, 27, 36, 43, 48, 52, 56, 60, 63, 66, 69, 72, 75, 77, 79, 82, 84, 86, 88, 90, 92, 93, 95, 97, 99, 100, 102, 103, 105, 106, 108, 109, 111, 112, 113, 115, 116, 117, 119, 120, 121, 122, 123, 125, 126, 127, 128, 129, 130, 131, 132, 133, 134, 136, 137, 138, 139, 140, 141, 141, 142, 143, 144, 145, 146, 147, 148, 149, 150, 151, 152, 152, 153, 154, 155, 156, 157, 157, 158, 159, 160, 161, 161, 162, 163, 164, 165, 165, 166, 167, 168, 168, 169, 170, 171, 171, 172, 173, 173, 174, 175, 176, 176, 177, 178, 178, 179, 180, 180, 181, 182, 182, 183, 184, 184, 185, 186, 186, 187, 187, 188, 189, 189, 190, 191, 191, 192, 192, 193, 194, 194, 195, 195, 196, 197, 197, 198, 198, 199, 200, 200, 201, 201, 202, 202, 203, 204, 204, 205, 205, 206, 206, 207, 207, 208, 208, 209, 210, 210, 211, 211, 212, 212, 213, 213, 214, 214, 215, 215, 216, 216, 217, 217, 218, 218, 219, 219, 220, 220, 221, 221, 222, 222, 223, 223, 224, 224, 225, 225, 226, 226, 227, 227, 228, 228, 229, 229, 229, 230, 230, 231, 231, 232, 232, 233, 233, 234, 234, 235, 235, 235, 236, 236, 237, 237, 238, 238, 239, 239, 239, 240, 240, 241, 241, 242, 242, 242, 243, 243, 244, 244, 245, 245, 245, 246, 246, 247, 247, 248, 248, 248, 249, 249, 250, 250, 250, 251, 251, 252, 252, 252, 253, 253, 254, 254, 255],
@@ -12,117 +16,326 @@ GammaCorrection_LookUpTable = {
     '5.0': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 5, 5, 5, 5, 6, 6, 6, 6, 7, 7, 7, 8, 8, 8, 9, 9, 9, 10, 10, 11, 11, 11, 12, 12, 13, 13, 14, 14, 15, 15, 16, 16, 17, 17, 18, 19, 19, 20, 21, 21, 22, 23, 24, 24, 25, 26, 27, 28, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 41, 42, 43, 44, 45, 47, 48, 49, 51, 52, 54, 55, 57, 58, 60, 61, 63, 64, 66, 68, 70, 71, 73, 75, 77, 79, 81, 83, 85, 87, 89, 92, 94, 96, 98, 101, 103, 106, 108, 111, 113, 116, 119, 121, 124, 127, 130, 133, 136, 139, 142, 145, 148, 152, 155, 158, 162, 165, 169, 173, 176, 180, 184, 188, 192, 196, 200, 204, 208, 213, 217, 221, 226, 230, 235, 240, 245, 250, 255]
 }
 
+# 噪声强度（配置 augmentation.params.noise_level，取值 [0, 1]）到噪声参数的换算：
+# 椒盐噪声的像素密度和高斯噪声的标准差（灰度级）
+NOISE_DENSITY_SCALE = 0.1
+NOISE_SIGMA_SCALE = 25.5
 
-def change_BrightAndContrastRatio(image, mode='Bright'):
-    """ (mode='Bright')(mode='ContrastRatio') """
-    if mode == 'Bright':
-        b = random.randint(0, 10) * 10
-        if random.randint(0, 2) == 0:
-            # print('bright up')
-            for i in range(image.shape[0]):
-                for j in range(image.shape[1]):
-                    image[i, j] = min(image[i, j] + b, 255)
-        else:
-            # print('bright down')
-            for i in range(image.shape[0]):
-                for j in range(image.shape[1]):
-                    image[i, j] = max(image[i, j] - b, 0)
-    else:
-        image = image.astype(int)
-        i = random.sample(['0.4', '0.67', '1.5', '2.5'], 1)[0]
-        gamma = GammaCorrection_LookUpTable[i]
-        # print('Gamma Correction:{}'.format(i))
-        for i in range(image.shape[0]):
-            for j in range(image.shape[1]):
-                image[i, j] = gamma[image[i, j]]
+# 增强参数（配置 augmentation.params）的默认值，与 config/default.yaml 一致
+DEFAULT_AUGMENTATION_PARAMS = {
+    'rotation_range': [-2, 2],   # 旋转角度范围（度）
+    'noise_level': [0.1, 0.3],   # 噪声强度范围 [0, 1]
+    'blur_kernel': [1, 3],       # 高斯模糊核大小范围（奇数，1 表示不模糊）
+    'brightness': [0.8, 1.2],    # 亮度倍数范围
+    'contrast': [0.8, 1.2],      # 对比度倍数范围
+    'gamma': [],                 # gamma 校正可选的查找表（GammaCorrection_LookUpTable 的键），空表示不做
+    'probability': 1 / 6,        # 每种增强被选中的概率
+}
+# 亮度、对比度倍数在范围内的取值个数，每种组合预先算好一张查找表
+TONE_LEVELS = 9
 
-    return image
+# gamma 查找表的 uint8 数组形式，与亮度/对比度查找表复合后用 cv2.LUT 执行
+_GAMMA_LUTS = {key: np.array(table, dtype=np.uint8) for key, table in GammaCorrection_LookUpTable.items()}
+
+
+def _default_rng(rng):
+    """未指定随机数生成器时使用一个新的、由系统熵源播种的生成器"""
+    return rng if rng is not None else np.random.default_rng()
+
+def _choice(rng, options):
+    return options[int(rng.integers(len(options)))]
 
-def add_noise(image, mode='SaltAndPepper'):
-    """ (mode='SaltAndPepper') (mode='Gaussion')"""
-    imgH, imgW = image.shape[:2]
+def add_noise(image, mode='SaltAndPepper', rng=None, level=0.5):
+    """ (mode='SaltAndPepper') (mode='Gaussion')
+
+    噪声强度 level 取值 [0, 1]：椒盐噪声按 level * NOISE_DENSITY_SCALE 的
+    密度随机置黑白点，高斯噪声的标准差为 level * NOISE_SIGMA_SCALE。
+    两种噪声都对整个数组一次抽样完成（单精度抽样，不产生 float64 中间数组）。
+    """
+    rng = _default_rng(rng)
     if mode == 'SaltAndPepper':
-        percetage = 0.05
-        noise_num = int(percetage * imgH * imgW)
-        for i in range(noise_num):
-            randX = random.randint(0, imgH-1)
-            randY = random.randint(0, imgW-1)
-            image[randX, randY] = random.randint(0, 1) * 255
+        density = level * NOISE_DENSITY_SCALE
+        mask = rng.random(image.shape[:2], dtype=np.float32) < density
+        image = image.copy()
+        image[mask] = rng.integers(0, 2, size=int(np.count_nonzero(mask))) * 255
     else:
-        for i in range(imgH):
-            for j in range(imgW):
-                image[i, j] = image[i, j] + random.gauss(0, 1)
-                image[i, j] = max(0, image[i, j])
-                image[i, j] = min(image[i, j], 255)
+        sigma = level * NOISE_SIGMA_SCALE
+        noise = rng.standard_normal(image.shape, dtype=np.float32)
+        noise *= sigma
+        noise += image
+        image = np.clip(noise, 0, 255, out=noise).astype(image.dtype)
 
     return image
 
-def geometric_transformation(image, mode='zoom'):
-    """
-    (1) zoom (2) rotate (3) affinity
+def geometric_matrix(shape, mode='zoom', rng=None):
+    """一种几何变换的 3x3 齐次矩阵（目标坐标 = 矩阵 @ 源坐标）及其缩放比例
+
+    Args:
+        shape: 变换前图像的 (高, 宽)
+        mode: 'zoom'、'rotate' 或 'affinity'，参数分布与逐个变换时相同
+
+    Returns:
+        (matrix, (fx, fy))：fx、fy 为输出尺寸相对于输入尺寸的比例
     """
+    rng = _default_rng(rng)
+    imgH, imgW = shape[:2]
+    fx = fy = 1
     if mode == 'zoom':
-        ratio = random.sample([0.8, 0.85, 0.9, 0.95], 1)[0]
+        ratio = _choice(rng, [0.8, 0.85, 0.9, 0.95])
         # print('zoom:{}'.format(ratio))
-        if random.randint(0, 1) == 0:
-            image = cv2.resize(image, None, fx=ratio, fy=1, interpolation=cv2.INTER_LINEAR)
+        if rng.integers(0, 2) == 0:
+            fx = ratio
         else:
-            image = cv2.resize(image, None, fx=1, fy=ratio, interpolation=cv2.INTER_LINEAR)
+            fy = ratio
+        # 与 cv2.resize 相同的像素中心对齐：dst = f * (src + 0.5) - 0.5
+        M = np.float64([[fx, 0, 0.5 * fx - 0.5], [0, fy, 0.5 * fy - 0.5]])
     elif mode == 'rotate':
-        imgH, imgW = image.shape[:2]
-        angle = random.randint(1, 10) * 0.1
+        angle = int(rng.integers(1, 11)) * 0.1
         # print('rotate:{}'.format(angle))
         M = cv2.getRotationMatrix2D((imgW / 2, imgH / 2), angle, 1)
-        image = cv2.warpAffine(image, M, (imgW, imgH), borderMode=cv2.BORDER_REPLICATE)
     else:
-        imgH, imgW = image.shape[:2]
-        offset = random.randint(5, 15) * random.sample([-1, 1], 1)[0]
+        offset = int(rng.integers(5, 16)) * _choice(rng, [-1, 1])
         # print('affine:{}'.format(offset))
         pts1 = np.float32([[0, 0], [0, imgH-1], [50, 0]])
         pts2 = np.float32([[0+offset, 0], [0, imgH-1], [50+offset, 0]])
         M = cv2.getAffineTransform(pts1, pts2)
-        image = cv2.warpAffine(image, M, (imgW, imgH), borderMode=cv2.BORDER_REPLICATE)
+    return np.vstack([M, [0, 0, 1]]), (fx, fy)
 
-    return image
+def _compose_warp(shape, builders, rng):
+    """按顺序合成 builders 给出的几何变换，返回 (2x3 矩阵, 输出尺寸 (宽, 高))
 
-def augment(image):
-    image = np.array(image, dtype='float32')
+    builders 中每一项为 builder(shape, rng=rng) -> (3x3 矩阵, (fx, fy))。
+    """
+    outH, outW = shape[:2]
+    M = np.eye(3)
+    for builder in builders:
+        step, (fx, fy) = builder((outH, outW), rng=rng)
+        M = step @ M
+        outW, outH = int(round(outW * fx)), int(round(outH * fy))
+    return M[:2], (outW, outH)
 
-    if random.randint(0, 5) == 0:
-        image = geometric_transformation(image, mode='affinity')
-    if random.randint(0, 5) == 0:
-        image = geometric_transformation(image, mode='rotate')
-    if random.randint(0, 5) == 0:
-        image = change_BrightAndContrastRatio(image, mode='Bright')
-    # image = add_noise(image)
+def _odd_range(low, high):
+    """[low, high] 内的奇数"""
+    return [k for k in range(int(low), int(high) + 1) if k % 2 == 1]
 
-    image = Image.fromarray(image.astype('uint8')).convert('L')
-    return image
+class AugmentationPipeline:
+    """由增强参数编译得到的增强流水线
+
+    构造时把参数（配置 augmentation.params）编译成一组预先绑定参数的
+    操作：亮度/对比度的全部组合预先算成查找表，各尺寸的高斯核预先算好，
+    调用时不再查字典、不再分派。每个样本的执行顺序为：
+
+    1. 几何变换（错切、按 rotation_range 旋转、缩放）合成一次 warpAffine
+    2. 亮度、对比度和（gamma 非空时）gamma 校正：查找表复合成一张，一次 cv2.LUT
+    3. 高斯模糊：按 blur_kernel 选核，cv2.sepFilter2D
+    4. 噪声：按 noise_level 抽取强度，椒盐或高斯噪声
+
+    每一步以 probability 的概率被选中。
+
+    Args:
+        params: 增强参数，缺省的键取 DEFAULT_AUGMENTATION_PARAMS 中的值
+    """
+
+    def __init__(self, params=None):
+        params = dict(DEFAULT_AUGMENTATION_PARAMS, **(params or {}))
+        unknown = set(params) - set(DEFAULT_AUGMENTATION_PARAMS)
+        if unknown:
+            raise ValueError('未知的增强参数: {}'.format(', '.join(sorted(unknown))))
+        self.params = params
+        self.probability = float(params['probability'])
+        self.rotation_range = tuple(float(v) for v in params['rotation_range'])
+        self.noise_level = tuple(float(v) for v in params['noise_level'])
+        self.geometric = [partial(geometric_matrix, mode='affinity'), self._rotate_matrix,
+                          partial(geometric_matrix, mode='zoom')]
+        self.tone_luts = self._compile_tone(params['brightness'], params['contrast'])
+        unknown = set(params['gamma']) - set(_GAMMA_LUTS)
+        if unknown:
+            raise ValueError('未知的 gamma 查找表: {}'.format(', '.join(sorted(unknown))))
+        self.gamma_luts = [_GAMMA_LUTS[key] for key in params['gamma']]
+        self.blur_kernels = [cv2.getGaussianKernel(k, 0) if k > 1 else None
+                             for k in _odd_range(*params['blur_kernel'])]
+
+    @staticmethod
+    def _compile_tone(brightness, contrast):
+        """亮度 b、对比度 c 各取 TONE_LEVELS 个值，预先算出全部组合的查找表
+
+        映射为 clip((x * b - 127.5) * c + 127.5)，形状 (亮度数, 对比度数, 256)。
+        """
+        b = np.unique(np.linspace(brightness[0], brightness[1], TONE_LEVELS))
+        c = np.unique(np.linspace(contrast[0], contrast[1], TONE_LEVELS))
+        x = np.arange(256, dtype=np.float64)
+        luts = (x * b[:, None, None] - 127.5) * c[None, :, None] + 127.5
+        return np.clip(np.rint(luts), 0, 255).astype(np.uint8)
 
-def main(input_path='./data/images/', output_path='./augmented_data/images/'):
+    def _rotate_matrix(self, shape, rng):
+        imgH, imgW = shape[:2]
+        angle = rng.uniform(*self.rotation_range)
+        M = cv2.getRotationMatrix2D((imgW / 2, imgH / 2), angle, 1)
+        return np.vstack([M, [0, 0, 1]]), (1, 1)
+
+    def _tone_lut(self, rng):
+        return self.tone_luts[rng.integers(self.tone_luts.shape[0]), rng.integers(self.tone_luts.shape[1])]
+
+    def _gamma_lut(self, rng):
+        return self.gamma_luts[rng.integers(len(self.gamma_luts))]
+
+    def _blur_kernel(self, rng):
+        if not self.blur_kernels:
+            return None
+        return self.blur_kernels[rng.integers(len(self.blur_kernels))]
+
+    def _noise_params(self, rng):
+        return _choice(rng, ['SaltAndPepper', 'Gaussion']), rng.uniform(*self.noise_level)
+
+    def _plan(self, shape, rng):
+        """为一个样本抽取全部随机参数
+
+        Returns:
+            (warp, lut, kernel, noise)：warp 为 (2x3 矩阵, 输出尺寸)，lut 为
+            亮度/对比度与 gamma 复合后的查找表，kernel 为高斯核，noise 为
+            (噪声类型, 强度)；
+            未选中的步骤为 None。噪声的逐像素抽样在执行时接着使用同一个 rng。
+        """
+        builders = [builder for builder in self.geometric if rng.random() < self.probability]
+        warp = _compose_warp(shape, builders, rng) if builders else None
+        lut = self._tone_lut(rng) if rng.random() < self.probability else None
+        # gamma 为空时不抽取，随机数流与不含 gamma 的流水线一致
+        gamma = self._gamma_lut(rng) if self.gamma_luts and rng.random() < self.probability else None
+        if gamma is not None:
+            # 先调亮度/对比度再做 gamma 校正，两张表复合成一张
+            lut = gamma if lut is None else gamma[lut]
+        kernel = self._blur_kernel(rng) if rng.random() < self.probability else None
+        noise = self._noise_params(rng) if rng.random() < self.probability else None
+        return warp, lut, kernel, noise
+
+    def _apply(self, image, plan, rng):
+        """按 _plan 抽取的参数增强一个 uint8 数组"""
+        warp, lut, kernel, noise = plan
+        if warp is not None:
+            image = cv2.warpAffine(image, warp[0], warp[1], flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_REPLICATE)
+        if lut is not None:
+            image = cv2.LUT(image, lut)
+        if kernel is not None:
+            image = cv2.sepFilter2D(image, -1, kernel, kernel, borderType=cv2.BORDER_REPLICATE)
+        if noise is not None:
+            mode, level = noise
+            image = add_noise(image, mode=mode, rng=rng, level=level)
+        return image
+
+    def __call__(self, image, rng=None):
+        """增强一个样本
+
+        Args:
+            image: PIL 图像或数组
+            rng: numpy.random.Generator，None 表示使用新的随机生成器
+
+        Returns:
+            增强后的 PIL 灰度图像
+        """
+        rng = _default_rng(rng)
+        image = np.array(image, dtype=np.uint8)
+        image = self._apply(image, self._plan(image.shape, rng), rng)
+        return Image.fromarray(image).convert('L')
+
+    def augment_batch(self, images, rngs):
+        """批量增强一组同尺寸的灰度图像
+
+        整批只做一次 uint8 转换，不再逐个样本在 PIL 图像和浮点数组之间
+        来回转换；各样本的参数由自己的 rng 抽取，执行时直接作用在批次数组
+        的视图上，没有被任何增强选中的样本原样返回、不复制。抽样顺序与
+        逐个调用相同，结果与逐个调用 __call__ 逐像素一致。
+
+        逐样本的查找表和模糊仍由 cv2 分别执行：cv2.LUT 等是 SIMD 实现，
+        比把整批堆成 (N, 256) 查找表再做 NumPy 花式索引快数倍。
+
+        Args:
+            images: N×H×W 的 uint8 数组（或同尺寸图像的序列）
+            rngs: 每个样本的 numpy.random.Generator
+
+        Returns:
+            增强后的 uint8 数组列表（缩放会改变尺寸，因此不保证能堆叠）
+        """
+        images = np.asarray(images, dtype=np.uint8)
+        if len(images) != len(rngs):
+            raise ValueError('图像数与随机数生成器数不一致: {} != {}'.format(len(images), len(rngs)))
+        shape = images.shape[1:]
+        return [self._apply(image, self._plan(shape, rng), rng) for image, rng in zip(images, rngs)]
+
+_pipelines = {}
+
+def compile_augmentation(params=None):
+    """编译增强参数，相同参数只编译一次（每个进程各自缓存）"""
+    key = json.dumps(params or {}, sort_keys=True)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        pipeline = _pipelines[key] = AugmentationPipeline(params)
+    return pipeline
+
+def augment(image, rng=None, params=None):
+    """随机数据增强
+
+    Args:
+        image: PIL 图像或数组
+        rng: numpy.random.Generator；传入按样本派生的生成器（见 seeding 模块）
+            时结果可复现，None 表示使用新的随机生成器
+        params: 增强参数（配置 augmentation.params），None 表示使用默认值
+    """
+    return compile_augmentation(params)(image, rng)
+
+def main(input_path='./data/images/', output_path='./augmented_data/images/',
+         compress_level=DEFAULT_COMPRESS_LEVEL, writer_workers=4, seed=None, augmentation=None):
     """主函数：执行数据增强
     
+    输入目录中有清单（manifest.npz）时按清单顺序读取，输出保持相同的
+    分桶相对路径并写出新的清单；否则按文件名顺序扫描输入目录。
+    第 n 张图片使用由主种子派生的独立随机数流，相同种子得到相同结果。
+
     Args:
         input_path: 输入图片目录路径
         output_path: 输出图片目录路径
+        compress_level: 输出图片的压缩级别 0-9
+        writer_workers: 编码和写文件的线程数
+        seed: 主种子，None 表示随机生成（会打印出来以便复现）
+        augmentation: 增强参数（配置 augmentation.params），None 表示使用默认值
     """
+    seed = make_master_seed(seed)
+    pipeline = compile_augmentation(augmentation)
+    print('Augmentation seed: {}'.format(seed))
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     
-    image_names = os.listdir(input_path)
+    manifest_path = os.path.join(input_path, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        entries = iter(Manifest(manifest_path))
+        manifest_out = ManifestWriter(os.path.join(output_path, MANIFEST_NAME))
+    else:
+        entries = ((name, None) for name in sorted(entry.name for entry in os.scandir(input_path)
+                                                   if entry.is_file() and entry.name != MANIFEST_NAME))
+        manifest_out = None
     count = 0
-    for image_name in image_names:
-        image_path = input_path + image_name
-        image_output = output_path + image_name
+    made_dirs = set()
+    with ImageWriter(writer_workers, compress_level) as writer:
+        for image_name, label in entries:
+            image_path = os.path.join(input_path, image_name)
+            image_output = os.path.join(output_path, image_name)
+            subdir = os.path.dirname(image_name)
+            if subdir not in made_dirs:
+                os.makedirs(os.path.join(output_path, subdir), exist_ok=True)
+                made_dirs.add(subdir)
 
-        image = Image.open(image_path)
-        image = augment(image)
+            image = Image.open(image_path)
+            image = pipeline(image, make_rng(seed, AUGMENT, count))
 
-        image.save(image_output)
+            writer.save(image_output, image)
+            if manifest_out is not None:
+                manifest_out.add(image_name, label)
 
-        count += 1
-        if count % 1000 == 0:
-            print('Images Augmented {}'.format(count))
+            count += 1
+            if count % 1000 == 0:
+                print('Images Augmented {}'.format(count))
+    if manifest_out is not None:
+        manifest_out.close()
     
     print('Data augmentation completed. Total: {} images'.format(count))
 
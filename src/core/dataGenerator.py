@@ -4,13 +4,22 @@ import sys
 # sys.setdefaultencoding('utf8')
 
 import os
+import multiprocessing
 import PIL.Image as PImage
-from PIL import ImageFont, ImageDraw
+from PIL import ImageDraw
 import numpy as np
 import random
 from ..data.dictionary import alphabet, nations
-from ..data.address_set import province_set, city_set, couty_set
-from .dataAugmentation import augment
+from ..data.region_table import region_table
+from .dataAugmentation import compile_augmentation
+from .record import IDcardRecord, make_record_batch, iter_records
+from .resource_cache import resource_cache, tile_cache
+from .pipeline import Pipeline
+from .sinks import open_sink, DEFAULT_SHARD_SIZE
+from .manifest import DEFAULT_FILES_PER_DIR
+from .run_journal import RunJournal
+from .seeding import make_master_seed, batch_rng, record_seed, spawn_rngs
+from .image_writer import CODECS, DEFAULT_COMPRESS_LEVEL, encode, benchmark_codecs, print_benchmark
 
 from tkinter import *
 from tkinter.ttk import *
@@ -27,6 +36,10 @@ boxes = {'name': [400, 680, 1000, 780],
          'birthday': [400, 960, 1330, 1060],
          'addr': [400, 1100, 1400, 1200],
          'idn': [400, 1450, 1800, 1550]}
+# 组合切片区域包含的字段
+tile_fields = {'sex_nation': ('sex', 'nation')}
+# 取值很少、渲染结果可复用的切片字段（2种性别、56个民族、112种组合）
+cached_tile_fields = ('sex', 'nation', 'sex_nation')
 images_output_path = './data/images/'
 txt_output_path = './data/annotations/'
 dict_sum = len(alphabet) + 1
@@ -36,264 +49,521 @@ if getattr(sys, 'frozen', None):
 else:
     base_dir = os.path.join(os.path.dirname(__file__), 'usedres')
 
-def IDcard_generator(amount):
-    name_all = []
-    sex_all = []
-    nation_all = []
-    addr_all = []
-    year_all = []
-    mon_all = []
-    day_all = []
-    id_all = []
-    others = []
-
-    numbers = '0123456789'
-    
-    # 常见姓氏
-    common_surnames = ['王', '李', '张', '刘', '陈', '杨', '赵', '黄', '周', '吴', 
-                       '徐', '孙', '胡', '朱', '高', '林', '何', '郭', '马', '罗',
-                       '梁', '宋', '郑', '谢', '韩', '唐', '冯', '于', '董', '萧']
-    
-    # 常见名字字符
-    common_name_chars = ['明', '华', '建', '文', '军', '国', '强', '民', '伟', '峰',
-                         '磊', '涛', '超', '辉', '宇', '杰', '浩', '志', '勇', '鹏',
-                         '娟', '英', '玲', '芳', '燕', '雯', '萍', '红', '慧', '静',
-                         '美', '丽', '秀', '敏', '艳', '莉', '梅', '琳', '君', '欣']
-
-    for i in range(amount):
-        # 改进姓名生成：姓氏+1-2个名字字符
-        surname = random.choice(common_surnames)
-        name_length = random.randint(1, 2)
-        given_name = ''.join(random.sample(common_name_chars, name_length))
-        name_all.append(surname + given_name)
-
-        result = random.sample(u'男女', 1)
-        sex_all.append(''.join(result))
-
-        result = random.sample(nations, 1)
-        nation_all.append(''.join(result))
-
-        # 修复年份生成：1950-2010年合理范围
-        year = random.randint(1950, 2010)
-        year_all.append(str(year))
-
-        # 修复月份生成：01-12月
-        month = random.randint(1, 12)
-        mon_all.append(f"{month:02d}")
-
-        # 修复日期生成：考虑月份天数
-        if month in [1, 3, 5, 7, 8, 10, 12]:
-            max_day = 31
-        elif month in [4, 6, 9, 11]:
-            max_day = 30
-        else:  # 2月
-            max_day = 28
-        day = random.randint(1, max_day)
-        day_all.append(f"{day:02d}")
-
-        id = []
-        addr = []
-        province = random.sample(province_set, 1)[0]
-        # province = [u'天津市', 12]
-        addr += province[0]
-        if province[0] in city_set.keys():
-            city = random.sample(city_set[province[0]], 1)[0]
-            addr += city[0]
-            if city[0][0] in couty_set.keys():
-                couty = random.sample(couty_set[city[0]], 1)
-                addr += couty[0]
-                id += str(couty[1])
-            else:
-                id += str(city[1])
-                if len(id) == 4:
-                    id += random.sample(numbers, 2)
-        else:
-            id += str(province[1])
-            if len(id) == 2:
-                id += random.sample(numbers, 4)
-        addr = ''.join(addr)
-        # 优化地址：移除随机字符填充，保持真实地址
-        if len(addr) > 20:  # 如果地址太长，适当截取
-            addr = addr[:20]
-        
-        # 修复身份证号生成：使用新的年月日
-        id += str(year)
-        id += f"{month:02d}"
-        id += f"{day:02d}"
-        id += random.sample(numbers, 3)
-        id += random.sample(u'0123456789X', 1)
-        addr_all.append(addr)
-        id_all.append(''.join(id))
-
-    return name_all, sex_all, nation_all, year_all, mon_all, day_all, addr_all, id_all
-
-def generator(num):
-    global ename, esex, enation, eyear, emon, eday, eaddr, eidn
-    images = []
-    for i in range(num):
-        name = ename[i]
-        sex = esex[i]
-        nation = enation[i]
-        year = eyear[i]
-        mon = emon[i]
-        day = eday[i]
-        addr = eaddr[i]
-        idn = eidn[i]
-
-        im = PImage.open(os.path.join(base_dir, 'fore.png'))
-
-        name_font = ImageFont.truetype(os.path.join(base_dir, 'hei.ttf'), 72)
-        other_font = ImageFont.truetype(os.path.join(base_dir, 'hei.ttf'), 60)
-        bdate_font = ImageFont.truetype(os.path.join(base_dir, 'fzhei.ttf'), 60)
-        id_font = ImageFont.truetype(os.path.join(base_dir, 'ocrb10bt.ttf'), 72)
-
-        draw = ImageDraw.Draw(im)
-        draw.text((630, 690), name, fill=(0, 0, 0), font=name_font)
-        draw.text((630, 840), sex, fill=(0, 0, 0), font=other_font)
-        draw.text((1030, 840), nation, fill=(0, 0, 0), font=other_font)
-        draw.text((630, 980), year, fill=(0, 0, 0), font=bdate_font)
-        draw.text((950, 980), mon, fill=(0, 0, 0), font=bdate_font)
-        draw.text((1150, 980), day, fill=(0, 0, 0), font=bdate_font)
-        start = 0
-        loc = 1120
-        while start + 11 < len(addr):
-            draw.text((630, loc), addr[start:start + 11], fill=(0, 0, 0), font=other_font)
-            start += 11
-            loc += 100
-        draw.text((630, loc), addr[start:], fill=(0, 0, 0), font=other_font)
-        draw.text((950, 1475), idn, fill=(0, 0, 0), font=id_font)
-
-        # im.save(output_path + 'color.png')
-        # im.convert('L').save(output_path + 'bw.png')
-        images.append(im.convert('L'))
-        if (i+1) % 100 == 0:
-            print('Generate images: {}/{}'.format(i+1, num))
-        
-    return images
-
-def fragment_IDcard_save(images, augmented=False, batch_name=None):
-    global ename, esex, enation, eyear, emon, eday, eaddr, eidn
-    txt_out = []
-    num = len(images)
-    if augmented:
-        print('Output augmented data to {} and {}'.format(images_output_path, txt_output_path))
+template_name = 'fore.png'
+fonts = {'name': ('hei.ttf', 72),
+         'other': ('hei.ttf', 60),
+         'bdate': ('fzhei.ttf', 60),
+         'id': ('ocrb10bt.ttf', 72)}
+
+# 常见姓氏
+common_surnames = ['王', '李', '张', '刘', '陈', '杨', '赵', '黄', '周', '吴',
+                   '徐', '孙', '胡', '朱', '高', '林', '何', '郭', '马', '罗',
+                   '梁', '宋', '郑', '谢', '韩', '唐', '冯', '于', '董', '萧']
+
+# 常见名字字符
+common_name_chars = ['明', '华', '建', '文', '军', '国', '强', '民', '伟', '峰',
+                     '磊', '涛', '超', '辉', '宇', '杰', '浩', '志', '勇', '鹏',
+                     '娟', '英', '玲', '芳', '燕', '雯', '萍', '红', '慧', '静',
+                     '美', '丽', '秀', '敏', '艳', '莉', '梅', '琳', '君', '欣']
+
+def _distinct_digits(rng, amount, k):
+    """每行抽取k个互不相同的数字，等价于 random.sample('0123456789', k)"""
+    return rng.random((amount, 10)).argsort(axis=1)[:, :k]
+
+
+def _digits_to_str(digits):
+    """将 (N, L) 的数字/码点矩阵转换为长度为L的字符串数组"""
+    digits = np.ascontiguousarray(digits, dtype='<u4')
+    return digits.view('<U%d' % digits.shape[1]).ravel()
+
+
+def IDcard_batch_generator(amount, rng=None):
+    """批量生成身份证内容（NumPy向量化）
+
+    一次性为全部记录抽取随机数，返回按列存储的字符串数组而非Python列表。
+
+    Args:
+        amount: 生成记录数量
+        rng: numpy.random.Generator，默认新建
+
+    Returns:
+        RECORD_DTYPE 结构化数组，字段为 name, sex, nation, year, mon, day, addr, idn
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # 姓名：姓氏 + 1-2个互不相同的名字字符
+    surnames = np.array(common_surnames)
+    name_chars = np.array(common_name_chars + [''])
+    n_chars = len(common_name_chars)
+    first = rng.integers(0, n_chars, amount)
+    second = rng.integers(0, n_chars - 1, amount)
+    second += second >= first
+    second[rng.integers(1, 3, amount) == 1] = n_chars
+    name = np.empty((amount, 3), dtype='<U1')
+    name[:, 0] = surnames[rng.integers(0, len(surnames), amount)]
+    name[:, 1] = name_chars[first]
+    name[:, 2] = name_chars[second]
+    name = name.view('<U3').ravel()
+
+    sex = np.array([u'男', u'女'])[rng.integers(0, 2, amount)]
+    nation = np.array(nations)[rng.integers(0, len(nations), amount)]
+
+    # 出生日期：1950-2010年，按月份天数抽取日期
+    year = rng.integers(1950, 2011, amount)
+    month = rng.integers(1, 13, amount)
+    max_day = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[month]
+    day = (rng.random(amount) * max_day).astype(np.int64) + 1
+
+    # 地区：从预编译的地区叶子表中按层级权重一次抽取
+    addr, region = region_table.draw(amount, rng)
+
+    # 身份证号：地区码(6) + 出生日期(8) + 顺序码(3) + 校验位(1)
+    idn = np.empty((amount, 18), dtype=np.int64)
+    for k in range(6):
+        idn[:, k] = region // 10 ** (5 - k) % 10
+    for k in range(4):
+        idn[:, 6 + k] = year // 10 ** (3 - k) % 10
+    idn[:, 10], idn[:, 11] = month // 10, month % 10
+    idn[:, 12], idn[:, 13] = day // 10, day % 10
+    idn[:, 14:17] = _distinct_digits(rng, amount, 3)
+    idn[:, 17] = rng.integers(0, 11, amount)
+    codes = idn + ord('0')
+    codes[:, 17][idn[:, 17] == 10] = ord('X')
+
+    idn = _digits_to_str(codes)
+    year = _digits_to_str(codes[:, 6:10])
+    mon = _digits_to_str(codes[:, 10:12])
+    day = _digits_to_str(codes[:, 12:14])
+    return make_record_batch(name, sex, nation, year, mon, day, addr, idn)
+
+
+def iter_IDcard_batches(total, batch_size=1000, seed=None, start_batch=0, stop_batch=None):
+    """按固定大小批次惰性生成身份证内容
+
+    每次只在内存中保留一个批次，内容占用的峰值内存与总数量无关。
+    第 i 个批次使用由主种子派生的独立随机数流 seeding.batch_rng(seed, i)，
+    因此任意批次都可以单独重新生成。
+
+    Args:
+        total: 生成记录总数
+        batch_size: 每批记录数
+        seed: 主种子，None 表示随机生成
+        start_batch: 从第几个批次开始生成
+        stop_batch: 在第几个批次之前停止，None 表示生成到最后
+
+    Yields:
+        IDcard_batch_generator 返回的列式批次，最后一批可能不足batch_size
+    """
+    seed = make_master_seed(seed)
+    stop = total if stop_batch is None else min(total, stop_batch * batch_size)
+    for batch_index, start in enumerate(range(start_batch * batch_size, stop, batch_size), start_batch):
+        yield IDcard_batch_generator(min(batch_size, total - start), batch_rng(seed, batch_index))
+
+
+def iter_IDcard_records(total, batch_size=1000, seed=None):
+    """逐条惰性产出身份证内容（IDcardRecord）"""
+    for batch in iter_IDcard_batches(total, batch_size, seed):
+        yield from iter_records(batch)
+
+
+def get_font(kind):
+    """从资源缓存获取 fonts 中定义的字体"""
+    font_name, size = fonts[kind]
+    return resource_cache.font(os.path.join(base_dir, font_name), size)
+
+def font_charsets():
+    """各字体需要预先光栅化的封闭字符集合"""
+    digits = '0123456789'
+    return {'name': set(''.join(common_surnames + common_name_chars)),
+            'other': set(u'男女' + ''.join(nations) + ''.join(region_table.addrs)),
+            'bdate': set(digits),
+            'id': set(digits + 'X')}
+
+def warm_up_resources(engine='pil'):
+    """预加载渲染用的字体和模板，需在创建进程池之前调用
+
+    Args:
+        engine: 渲染引擎，'atlas' 时同时预先光栅化全部字形
+    """
+    resource_cache.warm_up(
+        fonts=[(os.path.join(base_dir, font_name), size) for font_name, size in fonts.values()],
+        templates=[(os.path.join(base_dir, template_name), 'L')])
+    if engine == 'atlas':
+        for kind, chars in font_charsets().items():
+            get_atlas(kind).warm_up(chars)
+
+def get_atlas(kind):
+    """从资源缓存获取 fonts 中定义的字体对应的字形图集"""
+    font_name, size = fonts[kind]
+    return resource_cache.atlas(os.path.join(base_dir, font_name), size)
+
+def layout_IDcard(record):
+    """返回身份证正面的绘制列表 [(坐标, 文本, 字体类型, 所属字段), ...]"""
+    ops = [((630, 690), record.name, 'name', 'name'),
+           ((630, 840), record.sex, 'other', 'sex'),
+           ((1030, 840), record.nation, 'other', 'nation'),
+           ((630, 980), record.year, 'bdate', 'birthday'),
+           ((950, 980), record.mon, 'bdate', 'birthday'),
+           ((1150, 980), record.day, 'bdate', 'birthday')]
+    addr = record.addr
+    start = 0
+    loc = 1120
+    while start + 11 < len(addr):
+        ops.append(((630, loc), addr[start:start + 11], 'other', 'addr'))
+        start += 11
+        loc += 100
+    ops.append(((630, loc), addr[start:], 'other', 'addr'))
+    ops.append(((950, 1475), record.idn, 'id', 'idn'))
+    return ops
+
+def _draw_ops(canvas, ops, engine):
+    """在灰度画布上执行绘制列表；canvas 为 'L' 模式的 uint8 数组（原地修改）"""
+    if engine == 'atlas':
+        for xy, text, kind in ops:
+            get_atlas(kind).draw_text(canvas, xy, text, fill=0)
+        return PImage.fromarray(canvas, 'L')
+    im = PImage.fromarray(canvas, 'L')
+    draw = ImageDraw.Draw(im)
+    for xy, text, kind in ops:
+        draw.text(xy, text, fill=0, font=get_font(kind))
+    return im
+
+def render_IDcard(record, engine='pil'):
+    """渲染单张身份证正面灰度图像
+
+    模板预先转换为 'L' 模式并缓存，文字直接以标量灰度绘制，
+    不再为每张卡分配彩色图像再转换。
+
+    Args:
+        record: IDcardRecord
+        engine: 'pil' 使用 ImageDraw.text 逐字渲染；'atlas' 使用预光栅化的字形图集
+    """
+    template = resource_cache.template_array(os.path.join(base_dir, template_name), 'L')
+    ops = [(xy, text, kind) for xy, text, kind, field in layout_IDcard(record)]
+    return _draw_ops(template.copy(), ops, engine)
+
+def render_IDcard_tile(record, field, engine='pil'):
+    """直接在字段背景块上渲染单个切片区域
+
+    背景取自缓存模板中 boxes[field] 对应的区域，只绘制落在该区域内的文字，
+    结果与先渲染整张卡再 crop(boxes[field]) 相同，但不分配整卡画布。
+    """
+    x0, y0, x1, y1 = boxes[field]
+    owners = tile_fields.get(field, (field,))
+    template = resource_cache.template_array(os.path.join(base_dir, template_name), 'L')
+    ops = [((x - x0, y - y0), text, kind) for (x, y), text, kind, owner in layout_IDcard(record)
+           if owner in owners and x < x1 and y < y1]
+    return _draw_ops(template[y0:y1, x0:x1].copy(), ops, engine)
+
+def get_field_tile(record, field, engine='pil'):
+    """获取字段切片图像，低基数字段从 tile_cache 复制，其余直接渲染"""
+    if field not in cached_tile_fields:
+        return render_IDcard_tile(record, field, engine)
+    text = ''.join(getattr(record, owner) for owner in tile_fields.get(field, (field,)))
+    tile = tile_cache.get((field, text, engine, base_dir),
+                          lambda: render_IDcard_tile(record, field, engine))
+    return PImage.fromarray(tile, 'L')
+
+def fragment_samples(record, name, im=None, engine='pil', ext='.png', rng=None):
+    """单张身份证的字段切片样本
+
+    Args:
+        record: IDcardRecord
+        name: 文件名前缀，如 '0_12'
+        im: 渲染好的身份证图像；为 None 时按字段直接渲染切片（见 get_field_tile）
+        engine: im 为 None 时使用的渲染引擎
+        ext: 文件扩展名，由输出编码格式决定
+        rng: numpy.random.Generator，决定性别和民族是否分开切片；默认新建
+
+    Returns:
+        [(文件名, 标注文本, 切片图像), ...]
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    labels = record.labels()
+    if rng.integers(0, 3) > 0:
+        fields = ['name', 'sex', 'nation', 'birthday', 'addr', 'idn']
     else:
-        print('Output data to {} and {}'.format(images_output_path, txt_output_path))
-    for i in range(num):
-        name = u'姓名' + ename[i]
-        sex = u'性别' + esex[i]
-        nation = u'民族' + enation[i]
-        sex_nation = sex + nation
-        birthday = u'出生' + eyear[i] + u'年' + emon[i] + u'月' + eday[i] + u'日'
-        addr = u'住址' + eaddr[i]
-        idn = u'公民身份证号码' + eidn[i]
-
-        im = images[i]
-        # name
-        result = im.crop(boxes['name'])
-        if augmented:
-            result = augment(result)
-        result.save(images_output_path + batch_name + str(i) + '_name.png')
-        label = batch_name + str(i) + '_name.png ' + name + '\n'
-        txt_out.append(label)
-        if np.random.randint(0, 3) > 0:
-            # sex
-            result = im.crop(boxes['sex'])
-            if augmented:
-                result = augment(result)
-            result.save(images_output_path + batch_name + str(i) + '_sex.png')
-            label = batch_name + str(i) + '_sex.png ' + sex + '\n'
-            txt_out.append(label)
-            # nation
-            result = im.crop(boxes['nation'])
-            if augmented:
-                result = augment(result)
-            result.save(images_output_path + batch_name + str(i) + '_nation.png')
-            label = batch_name + str(i) + '_nation.png ' + nation + '\n'
-            txt_out.append(label)
+        fields = ['name', 'sex_nation', 'birthday', 'addr', 'idn']
+    samples = []
+    for field in fields:
+        if im is None:
+            result = get_field_tile(record, field, engine)
+        else:
+            result = im.crop(boxes[field])
+        samples.append((name + '_' + field + ext, labels[field], result))
+    return samples
+
+def card_samples(record, name, im, ext='.png'):
+    """整张身份证样本 [(文件名, 多行标注文本, 图像)]"""
+    labels = record.labels()
+    label = '\n'.join(labels[field] for field in ['name', 'sex_nation', 'birthday', 'addr', 'idn'])
+    return [(name + ext, label, im)]
+
+# ---- 流水线阶段：渲染 -> 裁剪/增强 -> 编码 -> 写入 ----
+# 每个阶段处理一个连续记录片段 task = (records, start, batch_index, options)，
+# start 为片段在批次内的起始序号，文件名和随机数流都由 (批次, 序号) 决定，
+# 与进程数和片段划分无关；
+# options 包含 fragment_IDcard、augmented、engine、render_tiles、codec、compress_level、seed、
+# augmentation（增强参数）。
+# 阶段之间传递 (samples, options, (count, hits, misses))，后者为片段的记录数
+# 和切片缓存命中计数。渲染阶段产出的样本额外带有该样本的增强随机数生成器，
+# 增强阶段用完后去掉。
+
+def render_chunk(task):
+    """渲染阶段：生成片段内全部记录的未增强样本"""
+    records, start, batch_index, options = task
+    hits, misses = tile_cache.hits, tile_cache.misses
+    ext = CODECS[options['codec']]
+    seed = options['seed']
+    samples = []
+    for j, row in enumerate(records):
+        record = IDcardRecord.from_row(row)
+        index = start + j
+        name = '{}_{}'.format(batch_index, index)
+        seed_seq = record_seed(seed, batch_index, index)
+        if options['fragment_IDcard']:
+            im = None if options['render_tiles'] else render_IDcard(record, options['engine'])
+            split_rng, = spawn_rngs(seed_seq, 1)
+            record_samples = fragment_samples(record, name, im, options['engine'], ext, split_rng)
         else:
-            # sex and nation
-            result = im.crop(boxes['sex_nation'])
-            if augmented:
-                result = augment(result)
-            result.save(images_output_path + batch_name + str(i) + '_sex_nation.png')
-            label = batch_name + str(i) + '_sex_nation.png ' + sex_nation + '\n'
-            txt_out.append(label)
-        # birthday
-        result = im.crop(boxes['birthday'])
-        if augmented:
-            result = augment(result)
-        result.save(images_output_path + batch_name + str(i) + '_birthday.png')
-        label = batch_name + str(i) + '_birthday.png ' + birthday + '\n'
-        txt_out.append(label)
-        # address
-        result = im.crop(boxes['addr'])
-        if augmented:
-            result = augment(result)
-        result.save(images_output_path + batch_name + str(i) + '_addr.png')
-        label = batch_name + str(i) + '_addr.png ' + addr + '\n'
-        txt_out.append(label)
-        # ID number
-        result = im.crop(boxes['idn'])
-        if augmented:
-            result = augment(result)
-        result.save(images_output_path + batch_name + str(i) + '_idn.png')
-        label = batch_name + str(i) + '_idn.png ' + idn + '\n'
-        txt_out.append(label)
-
-        if (i+1) % 100 == 0:
-            print('Output images: {}/{}'.format(i+1, num))
-
-    with open(txt_output_path + 'data.txt', 'w') as f:
-        for line in txt_out:
-            f.write(line)
-
-def IDcard_save(images, batch_name=None):
-    global ename, esex, enation, eyear, emon, eday, eaddr, eidn
-    txt_out = []
-    num = len(images)
-    print('Output data to {} and {}'.format(images_output_path, txt_output_path))
-    for i in range(num):
-        name = u'姓名' + ename[i] + '\n'
-        sex = u'性别' + esex[i]
-        nation = u'民族' + enation[i]
-        sex_nation = sex + nation + '\n'
-        birthday = u'出生' + eyear[i] + u'年' + emon[i] + u'月' + eday[i] + u'日' + '\n'
-        addr = u'住址' + eaddr[i] + '\n'
-        idn = u'公民身份证号码' + eidn[i] + '\n'
-
-        txt_out.append(batch_name + str(i) + '.png' + '\n')
-        txt_out.append(name + sex_nation + birthday + addr + idn)
-        images[i].save(images_output_path + batch_name + str(i) + '.png')
-
-        if (i+1) % 100 == 0:
-            print('Output images: {}/{}'.format(i+1, num))
-
-    with open(txt_output_path + 'data.txt', 'w') as f:
-        for line in txt_out:
-            f.write(line)
-
-
-def main(sample_sum=10, fragment_IDcard=False):
+            record_samples = card_samples(record, name, render_IDcard(record, options['engine']), ext)
+        if options['augmented']:
+            rngs = spawn_rngs(seed_seq, len(record_samples))
+        else:
+            rngs = [None] * len(record_samples)
+        samples += [sample + (rng,) for sample, rng in zip(record_samples, rngs)]
+    return samples, options, (len(records), tile_cache.hits - hits, tile_cache.misses - misses)
+
+def augment_chunk(result):
+    """增强阶段：按尺寸分组批量做数据增强，每个样本使用自己的随机数流"""
+    samples, options, stats = result
+    if options['augmented']:
+        # 同一字段的切片尺寸相同，按尺寸分组后整批增强
+        pipeline = compile_augmentation(options['augmentation'])
+        images = [np.asarray(im, dtype=np.uint8) for _, _, im, _ in samples]
+        groups = {}
+        for index, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(index)
+        for indices in groups.values():
+            results = pipeline.augment_batch(np.stack([images[i] for i in indices]),
+                                             [samples[i][3] for i in indices])
+            for i, result in zip(indices, results):
+                images[i] = result
+        samples = [(file_name, label, image) for (file_name, label, _, _), image in zip(samples, images)]
+    else:
+        samples = [(file_name, label, im) for file_name, label, im, _ in samples]
+    return samples, options, stats
+
+def encode_chunk(result):
+    """编码阶段：按 options['codec'] 将样本图像编码为字节串"""
+    samples, options, stats = result
+    codec, level = options['codec'], options['compress_level']
+    return [(file_name, label, encode(im, codec, level)) for file_name, label, im in samples], options, stats
+
+def process_chunk(task):
+    """在子进程中完成渲染、增强和编码"""
+    return encode_chunk(augment_chunk(render_chunk(task)))
+
+def _init_worker():
+    """子进程初始化：重新播种全局随机数，避免fork后各进程共享同一序列
+
+    生成和增强只使用由主种子派生的随机数流，这里只是兜底。
+    """
+    random.seed()
+    np.random.seed()
+
+def split_chunks(records, chunk_size):
+    """将批次切分为 (start, records) 连续片段"""
+    for start in range(0, len(records), chunk_size):
+        yield start, records[start:start + chunk_size]
+
+def iter_chunk_tasks(sample_sum, batch_size, chunk_size, options, start_batch=0, stop_batch=None):
+    """惰性产出流水线的片段任务，内容按批次由 options['seed'] 派生生成
+
+    Args:
+        start_batch: 从第几个批次开始
+        stop_batch: 在第几个批次之前停止，None 表示到最后
+    """
+    batches = iter_IDcard_batches(sample_sum, batch_size, options['seed'], start_batch, stop_batch)
+    for batch_index, records in enumerate(batches, start_batch):
+        for start, chunk in split_chunks(records, chunk_size):
+            yield chunk, start, batch_index, options
+
+
+def shard_batches(sample_sum, batch_size, shard=None):
+    """分片 K/N 负责的批次范围 [start_batch, stop_batch)
+
+    全部批次按序号连续地均分给 N 个分片，各分片互不相交；按 K 的顺序
+    合并各分片的输出即得到与单机运行相同的样本顺序。
+
+    Args:
+        shard: (K, N)，0 <= K < N；None 表示全部批次
+    """
+    num_batches = -(-sample_sum // batch_size)
+    if shard is None:
+        return 0, num_batches
+    k, n = shard
+    if not 0 <= k < n:
+        raise ValueError('分片序号应满足 0 <= K < N: {}/{}'.format(k, n))
+    return k * num_batches // n, (k + 1) * num_batches // n
+
+
+def main(sample_sum=10, fragment_IDcard=False, batch_size=1000, workers=1, chunk_size=None, engine='pil',
+         render_tiles=True, queue_size=8, codec='png', compress_level=DEFAULT_COMPRESS_LEVEL,
+         encode_workers=2, writer_workers=4, output='files', lmdb_path=None,
+         shard_dir=None, shard_size=DEFAULT_SHARD_SIZE, files_per_dir=DEFAULT_FILES_PER_DIR,
+         run_dir=None, resume=False, seed=None, shard=None, output_dir=None,
+         augmentation=None):
     """主函数：生成身份证数据
+
+    内容生成、渲染、增强、编码和写入组成有界队列流水线并行运行，
+    在途数据量固定，内存占用与样本总数无关。
     
     Args:
         sample_sum: 生成样本数量，默认为10
         fragment_IDcard: 是否生成切片图片，默认为False
+        batch_size: 每批生成的样本数量，内容按批惰性生成
+        workers: 渲染进程数，大于1时使用进程池并行渲染
+        chunk_size: 每个流水线任务包含的记录数，默认按批次大小和进程数自动切分
+        engine: 渲染引擎，'pil' 或 'atlas'（字形图集）
+        render_tiles: 切片模式下直接按字段渲染切片，不渲染整张身份证
+        queue_size: 流水线各阶段之间的队列容量（以片段计）
+        codec: 输出编码格式，'png'、'webp'（无损）或 'npy'
+        compress_level: png/webp 压缩级别 0-9
+        encode_workers: 单进程模式下编码阶段的线程数
+        writer_workers: 写文件线程数
+        output: 输出方式，'files'（图片目录 + data.txt）、'lmdb'（直接写入LMDB）
+            或 'tar'（WebDataset 风格的 tar 分片）
+        lmdb_path: output 为 'lmdb' 时的LMDB输出路径
+        shard_dir: output 为 'tar' 时的分片输出目录
+        shard_size: output 为 'tar' 时每个分片的样本数
+        files_per_dir: output 为 'files' 时每个子目录的文件数，不大于0时平铺
+        run_dir: 运行目录，非 None 时每完成一个批次就在其中记录检查点
+        resume: 从 run_dir 中的检查点续跑，跳过已完成的批次
+        seed: 主种子，None 表示随机生成；内容、切片划分和增强都由它派生，
+            相同种子和参数的输出与进程数无关、可逐字节复现
+        shard: (K, N)，只生成全局批次序号空间中第 K 个（共 N 个）互不相交的分片，
+            用于多机生成；同一种子下各分片合并后与单机运行一致
+        output_dir: output 为 'files' 时的输出根目录，图片写入其下 images/，
+            标注写入 annotations/data.txt；None 时使用 ./data/
+        augmentation: 切片增强参数（配置 augmentation.params），None 表示使用默认值
     """
-    global ename, esex, enation, eyear, emon, eday, eaddr, eidn
-    
-    print('--- Randomly Generate Content ---')
-    ename, esex, enation, eyear, emon, eday, eaddr, eidn = IDcard_generator(sample_sum)
-    print('--- Generate ID Card ---')
-    images = generator(num=sample_sum)
+    if output == 'lmdb' and not lmdb_path:
+        raise ValueError('output=lmdb 需要指定 lmdb_path')
+    if output == 'tar' and not shard_dir:
+        raise ValueError('output=tar 需要指定 shard_dir')
+    warm_up_resources(engine)
+    options = {'fragment_IDcard': fragment_IDcard,
+               'augmented': fragment_IDcard,
+               'engine': engine,
+               'render_tiles': render_tiles,
+               'codec': codec,
+               'compress_level': compress_level,
+               'seed': make_master_seed(seed),
+               'augmentation': augmentation}
+    if chunk_size is None:
+        chunk_size = max(1, min(64, -(-min(batch_size, max(sample_sum, 1)) // (max(workers, 1) * 4))))
+
+    # 影响输出内容的参数；续跑时必须与原运行一致
+    params = {'sample_sum': sample_sum, 'fragment_IDcard': fragment_IDcard, 'batch_size': batch_size,
+              'engine': engine, 'render_tiles': render_tiles, 'codec': codec, 'compress_level': compress_level,
+              'output': output, 'lmdb_path': lmdb_path, 'shard_dir': shard_dir, 'shard_size': shard_size,
+              'files_per_dir': files_per_dir, 'seed': options['seed'],
+              'shard': list(shard) if shard is not None else None, 'output_dir': output_dir,
+              'augmentation': augmentation}
+    if output_dir is None:
+        images_path, annotations_path = images_output_path, txt_output_path
+    else:
+        images_path = os.path.join(output_dir, 'images')
+        annotations_path = os.path.join(output_dir, 'annotations')
+    if output == 'files':
+        os.makedirs(images_path, exist_ok=True)
+        os.makedirs(annotations_path, exist_ok=True)
+    first_batch, stop_batch = shard_batches(sample_sum, batch_size, shard)
+    journal = RunJournal(run_dir) if run_dir else None
+    start_batch = first_batch
+    resume_state = None
+    if journal is not None and resume and journal.exists():
+        saved_params, entries = journal.load()
+        changed = sorted(key for key in set(params) | set(saved_params) if params.get(key) != saved_params.get(key))
+        if changed:
+            raise ValueError('续跑参数与原运行不一致: {}'.format(', '.join(changed)))
+        if entries:
+            resume_state = entries[-1]['sink_state']
+        start_batch = first_batch + len(entries)
+        journal.resume(entries)
+        print('Resume from batch {} ({} records done)'.format(start_batch, min(start_batch * batch_size, sample_sum)))
+    elif journal is not None:
+        journal.start(params)
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 else None
+    pipeline = Pipeline(queue_size)
+    if pool is not None:
+        # 每个线程把片段交给进程池并等待结果，线程数即同时在算的片段数
+        pipeline.add_stage(lambda task: pool.apply(process_chunk, (task,)), workers=workers, name='process')
+    else:
+        pipeline.add_stage(render_chunk, name='render')
+        pipeline.add_stage(augment_chunk, name='augment')
+        pipeline.add_stage(encode_chunk, workers=encode_workers, name='encode')
+
     if fragment_IDcard:
         print('--- Fragment ID card ---')
-        fragment_IDcard_save(images, augmented=True, batch_name='0_')
     else:
         print('--- ID card ---')
-        IDcard_save(images, batch_name='0_')
+    print('Seed: {}'.format(options['seed']))
+    if shard is not None:
+        print('Shard {}/{}: batches [{}, {})'.format(shard[0], shard[1], first_batch, stop_batch))
+    if output == 'lmdb':
+        print('Output data to {}'.format(lmdb_path))
+    elif output == 'tar':
+        print('Output data to {}'.format(shard_dir))
+    else:
+        print('Output data to {} and {}'.format(images_path, annotations_path))
+    cache_hits = cache_misses = 0
+    done = min(start_batch * batch_size, sample_sum)
+    batch_index = start_batch
+    try:
+        with open_sink(output, images_path, os.path.join(annotations_path, 'data.txt'), lmdb_path,
+                       fragment_IDcard, writer_workers, shard_dir, shard_size, files_per_dir,
+                       resume_state, durable=journal is not None) as sink:
+            tasks = iter_chunk_tasks(sample_sum, batch_size, chunk_size, options, start_batch, stop_batch)
+            for samples, _, (count, hits, misses) in pipeline.run(tasks):
+                # 写入阶段：按任务顺序交给接收器，保证输出顺序与进程数无关
+                for file_name, label, data in samples:
+                    sink.add(file_name, data, label)
+                cache_hits += hits
+                cache_misses += misses
+                done += count
+                batch_stop = min((batch_index + 1) * batch_size, sample_sum)
+                if done == batch_stop:
+                    # 批次全部写完：持久化输出后记入运行日志；进度每个批次打印一次
+                    if journal is not None:
+                        journal.record(batch_index, batch_index * batch_size, batch_stop, sink.checkpoint())
+                    print('Output images: {}/{}'.format(done, sample_sum))
+                    batch_index += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if journal is not None:
+            journal.close()
+    if cache_hits + cache_misses:
+        print('Tile cache: {} hits, {} misses, hit rate {:.1%}'.format(
+            cache_hits, cache_misses, cache_hits / (cache_hits + cache_misses)))
     print('--- Generate Database Successfully ---')
 
+def codec_benchmark(sample_sum=50, engine='pil', compress_levels=(1, 6, 9), workers=1):
+    """在真实字段切片上比较各输出编码格式的吞吐和文件大小"""
+    warm_up_resources(engine)
+    tiles = []
+    for record in iter_IDcard_records(sample_sum):
+        tiles += [im for _, _, im in fragment_samples(record, '', None, engine)]
+    print('Benchmark on {} field crops'.format(len(tiles)))
+    results = benchmark_codecs(tiles, compress_levels=compress_levels, workers=workers)
+    print_benchmark(results)
+    return results
+
 if __name__ == '__main__':
     main(sample_sum=10, fragment_IDcard=False)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+字形图集模块
+
+身份证上出现的字符集合是封闭的（alphabet、民族、数字及身份证号字符），
+因此每个 (字体, 字号, 字符) 只需经 FreeType 光栅化一次，得到 alpha 掩码
+和步进宽度；之后绘制字符串时直接用 NumPy 将掩码 alpha 混合到 uint8 数组中，
+不再逐字调用 ImageDraw.text。
+"""
+
+import numpy as np
+import PIL.Image as PImage
+from PIL import ImageDraw
+
+
+class GlyphAtlas:
+    """单个字体（固定字号）的字形图集"""
+
+    def __init__(self, font):
+        self.font = font
+        self._glyphs = {}
+
+    def glyph(self, char):
+        """返回字符的 (alpha掩码, x偏移, y偏移, 步进宽度)，首次访问时光栅化"""
+        return self._entry(char)[:4]
+
+    def _entry(self, char):
+        entry = self._glyphs.get(char)
+        if entry is None:
+            mask, left, top, advance = self._rasterize(char)
+            # 预先计算混合用的 alpha 与 255-alpha，绘制时不再做类型转换
+            alpha = mask.astype(np.uint16)
+            entry = (mask, left, top, advance, alpha, 255 - alpha)
+            self._glyphs[char] = entry
+        return entry
+
+    def _rasterize(self, char):
+        left, top, right, bottom = self.font.getbbox(char)
+        advance = self.font.getlength(char)
+        if right <= left or bottom <= top:
+            return np.zeros((0, 0), dtype=np.uint8), 0, 0, advance
+        # 用与 draw.text 相同的光栅化路径生成掩码，保证字形一致
+        mask = PImage.new('L', (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), char, fill=255, font=self.font)
+        return np.asarray(mask, dtype=np.uint8), left, top, advance
+
+    def warm_up(self, chars):
+        """预先光栅化给定字符集合"""
+        for char in set(chars):
+            self.glyph(char)
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def draw_text(self, canvas, xy, text, fill=0):
+        """在 uint8 数组上绘制字符串（原地修改）
+
+        Args:
+            canvas: (H, W) 或 (H, W, C) 的 uint8 数组
+            xy: 文本左上角坐标，与 draw.text 的默认锚点一致
+            text: 字符串
+            fill: 填充颜色，灰度为标量，彩色为与通道数一致的元组
+        """
+        height, width = canvas.shape[:2]
+        # region*(255-alpha) + fill*alpha 不超过 255*255，uint16 足够
+        fill = np.asarray(fill, dtype=np.uint16)
+        color = canvas.ndim == 3
+        pen_x, pen_y = xy
+        for char in text:
+            mask, left, top, advance, alpha, inv = self._entry(char)
+            x0 = int(round(pen_x)) + left
+            y0 = int(round(pen_y)) + top
+            pen_x += advance
+            mask_h, mask_w = mask.shape
+            if x0 < 0 or y0 < 0 or x0 + mask_w > width or y0 + mask_h > height:
+                # 裁掉超出画布的部分
+                cx0, cy0 = max(x0, 0), max(y0, 0)
+                cx1, cy1 = min(x0 + mask_w, width), min(y0 + mask_h, height)
+                if cx1 <= cx0 or cy1 <= cy0:
+                    continue
+                alpha = alpha[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+                inv = inv[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+                x0, y0, mask_w, mask_h = cx0, cy0, cx1 - cx0, cy1 - cy0
+            region = canvas[y0:y0 + mask_h, x0:x0 + mask_w]
+            if color:
+                alpha = alpha[:, :, None]
+                inv = inv[:, :, None]
+            region[...] = (region * inv + fill * alpha + 127) // 255
+        return canvas
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+图像编码与写入模块
+
+PNG 的 deflate 压缩往往是每个切片最大的开销。Pillow 在编码时会释放GIL，
+因此用线程池并行编码和写文件即可利用多核。支持的编码格式：
+
+- png:  可配置压缩级别，关闭 optimize
+- webp: 无损 WebP
+- npy:  原始 uint8 数组（np.save 格式），不压缩
+"""
+
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import PIL.Image as PImage
+
+CODECS = {'png': '.png', 'webp': '.webp', 'npy': '.npy'}
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+def codec_from_path(path):
+    """根据文件扩展名判断编码格式，未知扩展名按 png 处理"""
+    ext = os.path.splitext(path)[1].lower()
+    for codec, codec_ext in CODECS.items():
+        if ext == codec_ext:
+            return codec
+    return 'png'
+
+
+def encode(image, codec='png', compress_level=DEFAULT_COMPRESS_LEVEL):
+    """将图像编码为字节串
+
+    Args:
+        image: PIL 图像或 uint8 数组
+        codec: 'png'、'webp' 或 'npy'
+        compress_level: 压缩级别 0-9；png 直接使用，webp 映射为 method 0-6
+    """
+    buf = io.BytesIO()
+    if codec == 'npy':
+        np.save(buf, np.asarray(image, dtype=np.uint8), allow_pickle=False)
+        return buf.getvalue()
+    if not isinstance(image, PImage.Image):
+        image = PImage.fromarray(np.asarray(image, dtype=np.uint8))
+    if codec == 'png':
+        image.save(buf, 'PNG', compress_level=compress_level, optimize=False)
+    elif codec == 'webp':
+        image.save(buf, 'WEBP', lossless=True, method=int(round(compress_level * 6 / 9)))
+    else:
+        raise ValueError('未知的编码格式: {}'.format(codec))
+    return buf.getvalue()
+
+
+def decode(data, codec='png', mode=None):
+    """将字节串解码为 uint8 数组
+
+    Args:
+        data: encode() 得到的字节串
+        codec: 'png'、'webp' 或 'npy'
+        mode: 需要时转换的颜色模式，如 'L'（WebP 解码灰度图得到的是 RGB）；npy 忽略
+    """
+    buf = io.BytesIO(data)
+    if codec == 'npy':
+        return np.load(buf, allow_pickle=False)
+    image = PImage.open(buf)
+    if mode is not None and image.mode != mode:
+        image = image.convert(mode)
+    return np.asarray(image)
+
+
+class ImageWriter:
+    """线程池图像写入器
+
+    save()/write() 立即返回，编码和写文件在后台线程中完成；
+    在途任务数受 max_pending 限制，提交过快时调用方会阻塞。
+    close() 等待全部任务完成，并重新抛出后台任务中的第一个异常。
+    fsync=True 时每个文件写完后在写文件线程中 fsync，flush() 返回时
+    已提交的文件内容都已落盘（用于检查点）。
+    """
+
+    def __init__(self, workers=4, compress_level=DEFAULT_COMPRESS_LEVEL, max_pending=None, fsync=False):
+        self.compress_level = compress_level
+        self.fsync = fsync
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self._futures = set()
+        self._lock = threading.Lock()
+        self._error = None
+        self.files = 0
+        self.bytes = 0
+
+    def _submit(self, fn, *args):
+        if self._error is not None:
+            raise self._error
+        self._slots.acquire()
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+        if future.exception() is not None and self._error is None:
+            self._error = future.exception()
+
+    def _write(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        with self._lock:
+            self.files += 1
+            self.bytes += len(data)
+
+    def _encode_and_write(self, path, image, codec):
+        self._write(path, encode(image, codec, self.compress_level))
+
+    def write(self, path, data):
+        """异步写入已编码的字节串"""
+        self._submit(self._write, path, data)
+
+    def save(self, path, image, codec=None):
+        """异步编码并写入图像，codec 默认由扩展名决定"""
+        self._submit(self._encode_and_write, path, image, codec or codec_from_path(path))
+
+    def flush(self):
+        """等待已提交的任务全部完成（写入器仍可继续使用）"""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """等待全部任务完成"""
+        self._executor.shutdown(wait=True)
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+        return False
+
+
+def benchmark_codecs(images, codecs=('png', 'webp', 'npy'), compress_levels=(1, 6, 9), workers=1):
+    """测量各编码格式的编码吞吐与文件大小，并检查解码后与原图逐像素一致
+
+    Args:
+        images: PIL 图像或 uint8 数组列表
+        codecs: 参与测试的编码格式
+        compress_levels: png/webp 测试的压缩级别（npy 只测一次）
+        workers: 编码线程数
+
+    Returns:
+        [{'codec', 'compress_level', 'bytes_per_sec', 'mean_size', 'ratio'}, ...]，
+        bytes_per_sec 按原始像素字节计算
+    """
+    arrays = [np.asarray(image, dtype=np.uint8) for image in images]
+    raw_bytes = sum(array.nbytes for array in arrays)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for codec in codecs:
+            for level in (compress_levels if codec != 'npy' else (0,)):
+                start = time.perf_counter()
+                encoded = list(executor.map(lambda array: encode(array, codec, level), arrays))
+                elapsed = time.perf_counter() - start
+                for array, data in zip(arrays, encoded):
+                    if not np.array_equal(decode(data, codec, 'L' if array.ndim == 2 else None), array):
+                        raise ValueError('{} 编码（级别 {}）不是无损的'.format(codec, level))
+                sizes = [len(data) for data in encoded]
+                results.append({'codec': codec,
+                                'compress_level': level,
+                                'bytes_per_sec': raw_bytes / elapsed if elapsed > 0 else float('inf'),
+                                'mean_size': sum(sizes) / len(sizes),
+                                'ratio': sum(sizes) / raw_bytes})
+    return results
+
+
+def print_benchmark(results):
+    """打印 benchmark_codecs 的结果表"""
+    print('{:<6} {:>5} {:>12} {:>12} {:>8}'.format('codec', 'level', 'MB/s', 'mean size', 'ratio'))
+    for r in results:
+        print('{:<6} {:>5} {:>12.1f} {:>12.0f} {:>8.3f}'.format(
+            r['codec'], r['compress_level'], r['bytes_per_sec'] / 1e6, r['mean_size'], r['ratio']))
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+样本清单模块
+
+散文件输出按样本序号分桶到子目录（默认每个子目录1000个文件），
+避免单个目录中堆积数百万个文件。清单（manifest.npz）以列存方式记录
+每个样本的相对路径和标注：两列各自为一段 UTF-8 字节串加 int64 偏移，
+样本序号即行号。下游（数据增强、LMDB创建）直接读取清单，不再扫描目录。
+写入过程中条目只追加到 manifest.npz.partial 日志（可崩溃恢复），
+结束时从日志流式生成清单，内存占用与样本数无关。
+"""
+
+import os
+import struct
+import zipfile
+from array import array
+
+import numpy as np
+
+MANIFEST_NAME = 'manifest.npz'
+DEFAULT_FILES_PER_DIR = 1000
+COLUMNS = ('paths', 'labels')
+PARTIAL_SUFFIX = '.partial'
+_ENTRY_HEADER = struct.Struct('<II')
+# 读取日志和写出清单时的块大小
+_CHUNK_SIZE = 1 << 20
+
+
+def bucket_dir(index, files_per_dir=DEFAULT_FILES_PER_DIR):
+    """样本序号对应的子目录名，files_per_dir 不大于0时不分桶"""
+    if files_per_dir <= 0:
+        return ''
+    return '%06d' % (index // files_per_dir)
+
+
+def bucket_path(index, file_name, files_per_dir=DEFAULT_FILES_PER_DIR):
+    """样本序号对应的相对路径，如 000012/3_5_name.png"""
+    subdir = bucket_dir(index, files_per_dir)
+    return subdir + '/' + file_name if subdir else file_name
+
+
+def resolve_manifest(path):
+    """清单路径：传入目录时取其中的 manifest.npz"""
+    if os.path.isdir(path):
+        return os.path.join(path, MANIFEST_NAME)
+    return path
+
+
+class ManifestWriter:
+    """增量写入清单
+
+    每条记录只追加到 <path>.partial 日志（长度前缀的二进制记录），内存中
+    只保留条目数和各列的字节数；checkpoint() 时 fsync；close() 时流式读取
+    日志，按块写出列存的 manifest.npz，原子替换后删除日志。进程崩溃后以
+    追加模式打开即可从日志恢复。
+
+    Args:
+        path: 清单文件路径
+        append: 为 True 时在已有条目（日志或已完成的清单）之后继续追加
+        truncate_to: 追加模式下把日志截断到该字节数（checkpoint 的返回值）
+    """
+
+    def __init__(self, path, append=False, truncate_to=None):
+        self.path = path
+        self.log_path = path + PARTIAL_SUFFIX
+        self._count = 0
+        self._sizes = dict.fromkeys(COLUMNS, 0)
+        if append and os.path.exists(self.log_path):
+            size = 0
+            for size, *values in _iter_log(self.log_path, truncate_to):
+                self._count_entry(values)
+            self._log = open(self.log_path, 'r+b')
+            self._log.truncate(size)
+            self._log.seek(size)
+        else:
+            self._log = open(self.log_path, 'wb')
+            if append and os.path.exists(path):
+                for rel_path, label in Manifest(path):
+                    self.add(rel_path, label)
+
+    def _count_entry(self, values):
+        self._count += 1
+        for column, value in zip(COLUMNS, values):
+            self._sizes[column] += len(value)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, rel_path, label):
+        """追加一条记录，返回其样本序号"""
+        values = (rel_path.encode('utf-8'), label.encode('utf-8'))
+        self._log.write(_ENTRY_HEADER.pack(*map(len, values)) + values[0] + values[1])
+        self._count_entry(values)
+        return self._count - 1
+
+    def checkpoint(self):
+        """把日志持久化到磁盘，返回日志字节数"""
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        return self._log.tell()
+
+    def _column_chunks(self, index):
+        """按块产出第 index 列的 UTF-8 字节"""
+        chunk = bytearray()
+        for _, *values in _iter_log(self.log_path):
+            chunk += values[index]
+            if len(chunk) >= _CHUNK_SIZE:
+                yield chunk
+                chunk = bytearray()
+        yield chunk
+
+    def _offset_chunks(self, index):
+        """按块产出第 index 列的 int64 偏移（首项为0）"""
+        chunk, end = array('q', [0]), 0
+        for _, *values in _iter_log(self.log_path):
+            end += len(values[index])
+            chunk.append(end)
+            if len(chunk) * chunk.itemsize >= _CHUNK_SIZE:
+                yield chunk.tobytes()
+                chunk = array('q')
+        yield chunk.tobytes()
+
+    def close(self):
+        if self._log.closed:
+            return
+        self._log.flush()
+        tmp_path = self.path + '.tmp'
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for index, column in enumerate(COLUMNS):
+                _write_npy(archive, column + '_data', np.uint8, self._sizes[column], self._column_chunks(index))
+                _write_npy(archive, column + '_offsets', np.int64, self._count + 1, self._offset_chunks(index))
+        os.replace(tmp_path, self.path)
+        self._log.close()
+        os.remove(self.log_path)
+
+    def abort(self):
+        """异常结束：持久化日志并保留，供追加模式恢复"""
+        if self._log.closed:
+            return
+        self.checkpoint()
+        self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def _iter_log(log_path, limit=None):
+    """流式读取日志，产出 (条目结束的字节位置, 路径字节, 标注字节)
+
+    只读取前 limit 字节（None 表示全部）；崩溃时写了一半的尾部被忽略。
+    """
+    with open(log_path, 'rb') as f:
+        buf, pos, base = b'', 0, 0
+        while True:
+            size = _CHUNK_SIZE if limit is None else min(_CHUNK_SIZE, limit - base - len(buf))
+            data = f.read(size) if size > 0 else b''
+            if not data:
+                return
+            base += pos
+            buf, pos = buf[pos:] + data, 0
+            while pos + _ENTRY_HEADER.size <= len(buf):
+                path_len, label_len = _ENTRY_HEADER.unpack_from(buf, pos)
+                start = pos + _ENTRY_HEADER.size
+                end = start + path_len + label_len
+                if end > len(buf):
+                    break
+                yield base + end, buf[start:start + path_len], buf[start + path_len:end]
+                pos = end
+
+
+def _write_npy(archive, name, dtype, length, chunks):
+    """把一维数组按块写成 npz 中的 <name>.npy 成员，无需整体驻留内存"""
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (length,)}
+    with archive.open(name + '.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        for chunk in chunks:
+            f.write(chunk)
+
+
+class Manifest:
+    """只读清单，支持 len()、按序号取 (相对路径, 标注) 和迭代
+
+    Args:
+        path: 清单文件路径，或包含 manifest.npz 的目录
+    """
+
+    def __init__(self, path):
+        self.path = resolve_manifest(path)
+        self.root = os.path.dirname(self.path)
+        with np.load(self.path) as f:
+            self._data = {column: f[column + '_data'] for column in COLUMNS}
+            self._offsets = {column: f[column + '_offsets'] for column in COLUMNS}
+
+    def __len__(self):
+        return len(self._offsets['paths']) - 1
+
+    def _get(self, column, index):
+        offsets = self._offsets[column]
+        return self._data[column][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def path_at(self, index):
+        """样本的相对路径"""
+        return self._get('paths', index)
+
+    def label_at(self, index):
+        """样本的标注"""
+        return self._get('labels', index)
+
+    def full_path(self, index):
+        """样本的绝对路径（相对于清单所在目录）"""
+        return os.path.join(self.root, self.path_at(index))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.path_at(index), self.label_at(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.path_at(index), self.label_at(index)
+
+    def label_lengths(self):
+        """各样本标注的字节长度（用于按长度排序，无需解码）"""
+        return np.diff(self._offsets['labels'])
+
+
+def load_manifest(path):
+    """读取清单，path 可为文件或所在目录"""
+    return Manifest(path)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+流水线模块
+
+生产者/消费者式的多阶段流水线：各阶段之间用有界队列连接，
+下游处理不过来时上游自动阻塞（背压），因此在途数据量恒定，
+整体吞吐由最慢的阶段决定，而不是各阶段耗时之和。
+每个阶段可以有多个线程，输出按输入顺序重新排列后产出。
+"""
+
+import queue
+import threading
+
+_END = object()
+
+
+class PipelineError(RuntimeError):
+    """流水线某阶段执行失败"""
+
+
+class Pipeline:
+    """有界队列多阶段流水线
+
+    用法::
+
+        pipeline = Pipeline(queue_size=16)
+        pipeline.add_stage(render, workers=2, name='render')
+        pipeline.add_stage(encode, workers=4, name='encode')
+        for result in pipeline.run(tasks):
+            write(result)
+    """
+
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self.stages = []
+
+    def add_stage(self, fn, workers=1, name=None):
+        """追加一个阶段
+
+        Args:
+            fn: 处理函数，接收上一阶段的输出并返回本阶段的输出
+            workers: 本阶段的线程数
+            name: 阶段名称，用于错误信息
+        """
+        self.stages.append((fn, max(1, workers), name or getattr(fn, '__name__', 'stage')))
+        return self
+
+    def run(self, source):
+        """运行流水线，按 source 的顺序惰性产出最后一个阶段的结果"""
+        stop = threading.Event()
+        errors = []
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        # 限制在途（已送入但尚未产出）的数据总量，重排缓冲因此也是有界的
+        max_inflight = self.queue_size * (len(self.stages) + 1) + sum(stage[1] for stage in self.stages)
+        window = threading.Semaphore(max_inflight)
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def feed():
+            try:
+                for seq, item in enumerate(source):
+                    while not window.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if not put(queues[0], (seq, item)):
+                        return
+            except Exception as e:
+                errors.append(PipelineError('source: {!r}'.format(e)))
+                errors[-1].__cause__ = e
+                stop.set()
+                return
+            for _ in range(self.stages[0][1] if self.stages else 1):
+                put(queues[0], _END)
+
+        def work(index, fn, name, remaining, lock):
+            in_q, out_q = queues[index], queues[index + 1]
+            while True:
+                item = get(in_q)
+                if item is _END:
+                    break
+                seq, value = item
+                try:
+                    result = fn(value)
+                except Exception as e:
+                    errors.append(PipelineError('{}: {!r}'.format(name, e)))
+                    errors[-1].__cause__ = e
+                    stop.set()
+                    return
+                if not put(out_q, (seq, result)):
+                    return
+            # 本阶段最后一个结束的线程负责通知下游
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                downstream = self.stages[index + 1][1] if index + 1 < len(self.stages) else 1
+                for _ in range(downstream):
+                    put(out_q, _END)
+
+        threads.append(threading.Thread(target=feed, name='pipeline-source', daemon=True))
+        for index, (fn, workers, name) in enumerate(self.stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            for k in range(workers):
+                threads.append(threading.Thread(target=work, args=(index, fn, name, remaining, lock),
+                                                name='pipeline-{}-{}'.format(name, k), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # 按序号重排输出
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                item = get(queues[-1])
+                if item is _END:
+                    break
+                seq, value = item
+                pending[seq] = value
+                while next_seq in pending:
+                    window.release()
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+身份证记录模块
+
+单条记录使用带 __slots__ 的 IDcardRecord，批量记录使用定长字段的
+NumPy 结构化数组（RECORD_DTYPE），显式地在生成、渲染和保存之间传递，
+取代原先的模块级全局变量。
+"""
+
+import numpy as np
+
+RECORD_FIELDS = ('name', 'sex', 'nation', 'year', 'mon', 'day', 'addr', 'idn')
+
+# 各字段最大长度：姓名3字、民族最长5字、地址截断为20字、身份证号18位
+RECORD_DTYPE = np.dtype([('name', '<U3'),
+                         ('sex', '<U1'),
+                         ('nation', '<U5'),
+                         ('year', '<U4'),
+                         ('mon', '<U2'),
+                         ('day', '<U2'),
+                         ('addr', '<U20'),
+                         ('idn', '<U18')])
+
+
+class IDcardRecord:
+    """单条身份证记录"""
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, name, sex, nation, year, mon, day, addr, idn):
+        self.name = name
+        self.sex = sex
+        self.nation = nation
+        self.year = year
+        self.mon = mon
+        self.day = day
+        self.addr = addr
+        self.idn = idn
+
+    @classmethod
+    def from_row(cls, row):
+        """从 RECORD_DTYPE 结构化数组的一行构建记录"""
+        return cls(*(str(row[field]) for field in RECORD_FIELDS))
+
+    def labels(self):
+        """返回各切片区域对应的标注文本"""
+        sex = u'性别' + self.sex
+        nation = u'民族' + self.nation
+        return {'name': u'姓名' + self.name,
+                'sex': sex,
+                'nation': nation,
+                'sex_nation': sex + nation,
+                'birthday': u'出生' + self.year + u'年' + self.mon + u'月' + self.day + u'日',
+                'addr': u'住址' + self.addr,
+                'idn': u'公民身份证号码' + self.idn}
+
+    def __repr__(self):
+        return 'IDcardRecord({})'.format(', '.join(
+            '{}={!r}'.format(field, getattr(self, field)) for field in RECORD_FIELDS))
+
+
+def make_record_batch(name, sex, nation, year, mon, day, addr, idn):
+    """将八个等长字段列组合成 RECORD_DTYPE 结构化数组"""
+    batch = np.empty(len(name), dtype=RECORD_DTYPE)
+    for field, column in zip(RECORD_FIELDS, (name, sex, nation, year, mon, day, addr, idn)):
+        batch[field] = column
+    return batch
+
+
+def iter_records(batch):
+    """逐条产出批次中的 IDcardRecord"""
+    for row in batch:
+        yield IDcardRecord.from_row(row)
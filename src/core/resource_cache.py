@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+渲染资源缓存模块
+
+字体和字形图集按 (字体文件, 字号) 缓存，模板图片按路径缓存已解码的图像，
+每个进程只加载一次。在创建进程池之前预热缓存，子进程通过fork
+以写时复制的方式共享已加载的数据。
+
+TileCache 缓存取值很少的字段（性别、民族等）渲染好的未增强切片。
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+import PIL.Image as PImage
+from PIL import ImageFont
+from .glyph_atlas import GlyphAtlas
+
+
+class ResourceCache:
+    """字体与模板图片缓存"""
+
+    def __init__(self):
+        self._fonts = {}
+        self._atlases = {}
+        self._templates = {}
+        self._arrays = {}
+
+    def font(self, font_path, size):
+        """获取 (字体文件, 字号) 对应的字体对象，首次访问时加载"""
+        key = (os.path.abspath(font_path), size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(font_path, size)
+            self._fonts[key] = font
+        return font
+
+    def atlas(self, font_path, size):
+        """获取 (字体文件, 字号) 对应的字形图集"""
+        key = (os.path.abspath(font_path), size)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(self.font(font_path, size))
+            self._atlases[key] = atlas
+        return atlas
+
+    def template(self, image_path, mode=None):
+        """获取已解码的模板图片（只读共享，不要直接在其上绘制）
+
+        Args:
+            image_path: 模板图片路径
+            mode: 需要时转换的颜色模式，如 'L'；None 表示保持原模式
+        """
+        key = (os.path.abspath(image_path), mode)
+        image = self._templates.get(key)
+        if image is None:
+            image = PImage.open(image_path)
+            image.load()
+            if mode is not None and image.mode != mode:
+                image = image.convert(mode)
+            self._templates[key] = image
+        return image
+
+    def template_array(self, image_path, mode=None):
+        """获取模板图片的只读 uint8 数组，供数组渲染引擎复制使用"""
+        key = (os.path.abspath(image_path), mode)
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.asarray(self.template(image_path, mode), dtype=np.uint8)
+            array.flags.writeable = False
+            self._arrays[key] = array
+        return array
+
+    def warm_up(self, fonts=(), templates=()):
+        """预先加载字体和模板
+
+        Args:
+            fonts: (字体路径, 字号) 列表
+            templates: 模板图片路径列表，或 (路径, 模式) 列表
+        """
+        for font_path, size in fonts:
+            self.font(font_path, size)
+        for template in templates:
+            if isinstance(template, (tuple, list)):
+                self.template(*template)
+            else:
+                self.template(template)
+
+    def clear(self):
+        """清空缓存"""
+        self._fonts.clear()
+        self._atlases.clear()
+        self._templates.clear()
+        self._arrays.clear()
+
+
+resource_cache = ResourceCache()
+
+
+class TileCache:
+    """有界LRU切片缓存，键为 (字段, 文本, ...)，值为只读的 uint8 数组"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """返回键对应切片的副本；未命中时调用 render() 生成并缓存"""
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile.copy()
+        self.misses += 1
+        tile = np.array(render(), dtype=np.uint8)
+        tile.flags.writeable = False
+        self._tiles[key] = tile
+        if len(self._tiles) > self.maxsize:
+            self._tiles.popitem(last=False)
+        return tile.copy()
+
+    def stats(self):
+        """返回命中统计 {'hits', 'misses', 'hit_rate', 'size'}"""
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._tiles)}
+
+    def clear(self):
+        """清空缓存和计数"""
+        self._tiles.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+tile_cache = TileCache()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+运行日志模块
+
+长时间的生成任务在运行目录中记录进度，被中断后可以从断点继续：
+
+- run.json: 本次运行的参数，其中包括主种子
+- journal.jsonl: 每完成一个批次追加一行，记录批次序号、记录范围以及
+  输出接收器的检查点状态；每行写入后立即 fsync
+
+每个批次的随机数流由 (主种子, 批次序号) 直接派生（见 seeding 模块），
+因此续跑时只需跳过日志中已完成的批次，并把输出回退到最后一个检查点，
+之后的输出与未中断的运行一致。
+"""
+
+import json
+import os
+
+RUN_FILE = 'run.json'
+JOURNAL_FILE = 'journal.jsonl'
+
+
+class RunJournal:
+    """运行目录中的参数文件与批次完成日志
+
+    Args:
+        run_dir: 运行目录
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.run_path = os.path.join(run_dir, RUN_FILE)
+        self.journal_path = os.path.join(run_dir, JOURNAL_FILE)
+        self._journal = None
+
+    def exists(self):
+        """运行目录中是否已有运行记录"""
+        return os.path.exists(self.run_path)
+
+    def start(self, params):
+        """开始一次新的运行：写入参数，清空日志"""
+        os.makedirs(self.run_dir, exist_ok=True)
+        _write_json_atomic(self.run_path, {'params': params})
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._sync()
+
+    def load(self):
+        """读取运行参数和已完成的批次
+
+        Returns:
+            (params, entries)：entries 为按批次顺序排列的完成记录
+            （忽略崩溃时写了一半的最后一行）
+        """
+        with open(self.run_path, encoding='utf-8') as f:
+            run = json.load(f)
+        entries = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entries and entry['batch'] != entries[-1]['batch'] + 1:
+                        break
+                    entries.append(entry)
+        return run['params'], entries
+
+    def resume(self, entries):
+        """续跑：重写日志只保留 entries（丢弃不完整的尾部），之后继续追加"""
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def record(self, batch, start, stop, sink_state):
+        """记录一个已完成并已持久化的批次"""
+        entry = {'batch': batch, 'start': start, 'stop': stop, 'sink_state': sink_state}
+        self._journal.write(json.dumps(entry) + '\n')
+        self._sync()
+        return entry
+
+    def _sync(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+随机数播种模块
+
+每次运行只有一个主种子（master seed），所有随机性都由它按坐标派生：
+SeedSequence(主种子, spawn_key=(数据流, 批次[, 记录])) 直接定位到某个批次
+或某条记录的子随机数流，不依赖生成顺序。因此任意批次都可以单独重新
+生成，结果与进程数、片段划分和运行机器无关。
+
+数据流：
+
+- CONTENT: 每个批次的身份证内容（姓名、地址、号码……）
+- SAMPLE:  每条记录的切片划分和数据增强
+- AUGMENT: 独立运行数据增强时按样本序号派生
+"""
+
+import numpy as np
+
+CONTENT = 0
+SAMPLE = 1
+AUGMENT = 2
+
+
+def make_master_seed(seed=None):
+    """返回本次运行的主种子；seed 为 None 时从系统熵源生成一个"""
+    if seed is None:
+        return int(np.random.SeedSequence().entropy)
+    return int(seed)
+
+
+def seed_sequence(seed, *key):
+    """主种子在坐标 key 处的子种子序列"""
+    return np.random.SeedSequence(seed, spawn_key=tuple(int(k) for k in key))
+
+
+def make_rng(seed, *key):
+    """主种子在坐标 key 处的随机数生成器"""
+    return np.random.Generator(np.random.PCG64(seed_sequence(seed, *key)))
+
+
+def batch_rng(seed, batch_index):
+    """批次内容的随机数生成器"""
+    return make_rng(seed, CONTENT, batch_index)
+
+
+def record_seed(seed, batch_index, record_index):
+    """一条记录的种子序列，用于切片划分和各样本的增强"""
+    return seed_sequence(seed, SAMPLE, batch_index, record_index)
+
+
+def spawn_rngs(seed_seq, count):
+    """从种子序列依次派生 count 个随机数生成器
+
+    同一个种子序列对象再次调用时接着派生新的子流，因此可以先派生一个
+    用于划分、确定样本数后再为每个样本派生一个。
+    """
+    return [np.random.Generator(np.random.PCG64(child)) for child in seed_seq.spawn(count)]
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+样本输出模块
+
+生成流水线的写入阶段把编码好的样本交给接收器(sink)。所有接收器
+提供相同的接口：
+
+- add(file_name, data, label): 追加一个样本（编码后的字节串及其标注）
+- checkpoint(): 持久化已追加的样本，返回可 JSON 序列化的状态
+- close(): 完成输出
+
+以 resume_state=<checkpoint() 的返回值> 重新创建接收器时，输出回退到
+该检查点并从那里继续追加，用于中断后的续跑。
+
+可用的接收器：
+
+- DirectorySink: 分桶的散文件目录 + 清单（见 manifest 模块）+ data.txt 标注
+- LmdbSink: 直接写入LMDB（见 create_dataset.LmdbSink）
+- TarShardSink: WebDataset 风格的顺序 tar 分片
+"""
+
+import glob
+import io
+import os
+import tarfile
+
+from .image_writer import ImageWriter
+from .annotation_writer import AnnotationWriter
+from .create_dataset import LmdbSink
+from .manifest import ManifestWriter, MANIFEST_NAME, DEFAULT_FILES_PER_DIR, bucket_path
+
+SINKS = ('files', 'lmdb', 'tar')
+DEFAULT_SHARD_SIZE = 10000
+
+
+def format_annotation(file_name, label, fragment_IDcard):
+    """生成 data.txt 中一个样本的标注行"""
+    if fragment_IDcard:
+        return file_name + ' ' + label + '\n'
+    return file_name + '\n' + label + '\n'
+
+
+class DirectorySink:
+    """散文件输出
+
+    图片按样本序号分桶写入 images_path 下的子目录（每个子目录
+    files_per_dir 个文件），同时写入清单 manifest.npz 和 data.txt 标注
+    （路径为相对于 images_path 的相对路径）。标注经 AnnotationWriter
+    流式写入，定期 fsync，结束时原子重命名。
+
+    Args:
+        images_path: 图片输出根目录
+        annotation_file: data.txt 路径
+        fragment_IDcard: 标注是否为切片格式（每行一个样本）
+        writer_workers: 写文件线程数
+        files_per_dir: 每个子目录的文件数，不大于0时平铺在 images_path 下
+        txt_mode: 'w' 新建，'a' 在已有标注和清单之后追加
+        resume_state: checkpoint() 返回的状态，从该检查点续写
+        durable: 为 True 时每个图片文件写完即 fsync，checkpoint() 再 fsync
+            新写入文件所在的子目录，返回时检查点之前的图片都已落盘
+    """
+
+    def __init__(self, images_path, annotation_file, fragment_IDcard=True, writer_workers=4,
+                 files_per_dir=DEFAULT_FILES_PER_DIR, txt_mode='w', resume_state=None, durable=False):
+        self.images_path = images_path
+        self.fragment_IDcard = fragment_IDcard
+        self.files_per_dir = files_per_dir
+        if resume_state is not None:
+            txt_mode = 'a'
+        resume_state = resume_state or {}
+        self._manifest = ManifestWriter(os.path.join(images_path, MANIFEST_NAME), txt_mode == 'a',
+                                        resume_state.get('manifest'))
+        self._annotations = AnnotationWriter(annotation_file, txt_mode,
+                                             truncate_to=resume_state.get('annotations'))
+        self.durable = durable
+        self._writer = ImageWriter(writer_workers, fsync=durable)
+        self._made_dirs = set()
+        self._dirty_dirs = set()
+
+    def _next_path(self, file_name, label):
+        rel_path = bucket_path(len(self._manifest), file_name, self.files_per_dir)
+        subdir = os.path.dirname(rel_path)
+        if subdir not in self._made_dirs:
+            os.makedirs(os.path.join(self.images_path, subdir), exist_ok=True)
+            self._made_dirs.add(subdir)
+            # 新建的子目录本身是 images_path 中的目录项
+            self._dirty_dirs.add('')
+        self._dirty_dirs.add(subdir)
+        self._manifest.add(rel_path, label)
+        self._annotations.write(format_annotation(rel_path, label, self.fragment_IDcard))
+        return os.path.join(self.images_path, rel_path)
+
+    def add(self, file_name, data, label):
+        self._writer.write(self._next_path(file_name, label), data)
+
+    def checkpoint(self):
+        """等待图片写完（durable 时连同目录项一起落盘），再持久化标注和清单"""
+        self._writer.flush()
+        if self.durable:
+            for subdir in sorted(self._dirty_dirs, key=len, reverse=True):
+                _fsync_path(os.path.join(self.images_path, subdir))
+        self._dirty_dirs.clear()
+        return {'annotations': self._annotations.checkpoint(),
+                'manifest': self._manifest.checkpoint(),
+                'count': len(self._manifest)}
+
+    def close(self):
+        try:
+            self._writer.close()
+        except Exception:
+            self._annotations.abort()
+            self._manifest.abort()
+            raise
+        self._annotations.close()
+        self._manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._writer.__exit__(exc_type, exc, tb)
+            self._annotations.abort()
+            self._manifest.abort()
+        return False
+
+
+class TarShardSink:
+    """WebDataset 风格的 tar 分片输出
+
+    样本按顺序写入 shard-000000.tar、shard-000001.tar ……，每个分片最多
+    shard_size 个样本。每个样本占两个相邻成员：图片 <key>.<ext> 和
+    标注 <key>.txt（UTF-8），key 为去掉扩展名的文件名。成员的时间戳和
+    属主固定，相同输入得到逐字节相同的分片。写满的分片关闭前 fsync，
+    checkpoint() 再 fsync 当前分片和（新建过分片时）分片目录，返回时
+    检查点引用的分片都已落盘。
+    """
+
+    def __init__(self, shard_dir, shard_size=DEFAULT_SHARD_SIZE, pattern='shard-%06d.tar', resume_state=None):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.pattern = pattern
+        self.shards = []
+        self.count = 0
+        self._tar = None
+        self._in_shard = 0
+        self._new_shard = False
+        if resume_state is not None:
+            self._resume(resume_state)
+
+    def _resume(self, state):
+        self.count = state['count']
+        self.shards = [os.path.join(self.shard_dir, self.pattern % i) for i in range(state['shards'])]
+        # 删除检查点之后才创建的分片
+        index = state['shards']
+        while os.path.exists(os.path.join(self.shard_dir, self.pattern % index)):
+            os.remove(os.path.join(self.shard_dir, self.pattern % index))
+            index += 1
+        if self.shards:
+            # 把当前分片截断到检查点处的成员边界并补上结束块，再以追加模式打开
+            with open(self.shards[-1], 'r+b') as f:
+                f.truncate(state['offset'])
+                f.seek(state['offset'])
+                f.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+            self._tar = tarfile.open(self.shards[-1], 'a', format=tarfile.USTAR_FORMAT)
+            self._in_shard = state['in_shard']
+
+    def _open_next(self):
+        if self._tar is not None:
+            self._tar.close()
+            _fsync_path(self.shards[-1])
+        path = os.path.join(self.shard_dir, self.pattern % len(self.shards))
+        self.shards.append(path)
+        self._tar = tarfile.open(path, 'w', format=tarfile.USTAR_FORMAT)
+        self._in_shard = 0
+        self._new_shard = True
+
+    def _add_member(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def add(self, file_name, data, label):
+        if self._tar is None or self._in_shard >= self.shard_size:
+            self._open_next()
+        key, ext = os.path.splitext(file_name)
+        self._add_member(key + ext, data)
+        self._add_member(key + '.txt', label.encode('utf-8'))
+        self._in_shard += 1
+        self.count += 1
+
+    def checkpoint(self):
+        state = {'count': self.count, 'shards': len(self.shards), 'offset': 0, 'in_shard': self._in_shard}
+        if self._tar is not None:
+            self._tar.fileobj.flush()
+            os.fsync(self._tar.fileobj.fileno())
+            state['offset'] = self._tar.offset
+        if self._new_shard:
+            _fsync_path(self.shard_dir)
+            self._new_shard = False
+        return state
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        print('Wrote {} samples to {} shards'.format(self.count, len(self.shards)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _fsync_path(path):
+    """fsync 文件或目录（目录：使其中新建文件的目录项落盘）"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def list_tar_shards(shard_dir, pattern='shard-*.tar'):
+    """按顺序列出目录中的 tar 分片"""
+    return sorted(glob.glob(os.path.join(shard_dir, pattern)))
+
+
+def iter_tar_shards(shards):
+    """流式读取 tar 分片，逐个产出 (key, 文件名, 图片字节串, 标注)
+
+    分片按顺序流式读取（不随机访问、不解压到磁盘），内存中只保留
+    当前样本。
+
+    Args:
+        shards: 分片路径列表、单个分片路径，或分片所在目录
+    """
+    if isinstance(shards, str):
+        shards = list_tar_shards(shards) if os.path.isdir(shards) else [shards]
+    for path in shards:
+        with tarfile.open(path, 'r|') as tar:
+            key = None
+            sample = {}
+            for member in tar:
+                if not member.isfile():
+                    continue
+                member_key, ext = os.path.splitext(member.name)
+                if member_key != key:
+                    if key is not None:
+                        yield _tar_sample(key, sample)
+                    key = member_key
+                    sample = {}
+                sample[ext] = tar.extractfile(member).read()
+            if key is not None:
+                yield _tar_sample(key, sample)
+
+
+def merge_tar_shards(input_dirs, output_dir, shard_size=DEFAULT_SHARD_SIZE):
+    """按顺序合并多个分片目录（如多机分片生成的输出）
+
+    成员按字节复制到新的、连续编号的分片中，不解码图片。
+
+    Args:
+        input_dirs: 输入分片目录列表，按分片序号排列
+        output_dir: 合并后的分片目录
+        shard_size: 合并后每个分片的样本数
+
+    Returns:
+        合并后的样本数
+    """
+    shards = [path for input_dir in input_dirs for path in list_tar_shards(input_dir)]
+    with TarShardSink(output_dir, shard_size) as sink:
+        for _, file_name, data, label in iter_tar_shards(shards):
+            sink.add(file_name, data, label)
+    return sink.count
+
+
+def _tar_sample(key, sample):
+    label = sample.pop('.txt', b'').decode('utf-8')
+    ext, data = next(iter(sample.items()))
+    return key, key + ext, data, label
+
+
+def open_sink(kind, images_path=None, annotation_file=None, lmdb_path=None, fragment_IDcard=True,
+              writer_workers=4, shard_dir=None, shard_size=DEFAULT_SHARD_SIZE, files_per_dir=DEFAULT_FILES_PER_DIR,
+              resume_state=None, durable=False):
+    """按类型创建接收器
+
+    Args:
+        kind: 'files'、'lmdb' 或 'tar'
+        images_path: files 模式的图片目录
+        annotation_file: files 模式的标注文件路径
+        lmdb_path: lmdb 模式的输出路径
+        fragment_IDcard: 标注是否为切片格式（每行一个样本）
+        writer_workers: files 模式的写文件线程数
+        shard_dir: tar 模式的分片输出目录
+        shard_size: tar 模式每个分片的样本数
+        files_per_dir: files 模式每个子目录的文件数
+        resume_state: 接收器 checkpoint() 返回的状态，从该检查点续写
+        durable: files 模式下检查点是否保证图片文件已落盘（写运行日志时需要）
+    """
+    if kind == 'files':
+        return DirectorySink(images_path, annotation_file, fragment_IDcard, writer_workers, files_per_dir,
+                             resume_state=resume_state, durable=durable)
+    if kind == 'lmdb':
+        return LmdbSink(lmdb_path, resume_state=resume_state)
+    if kind == 'tar':
+        return TarShardSink(shard_dir, shard_size, resume_state=resume_state)
+    raise ValueError('未知的输出类型: {}'.format(kind))
@@ -6,6 +6,7 @@
 
 from .dictionary import alphabet, nations, common_surnames, common_name_chars
 from .address_set import province_set, city_set, couty_set
+from .region_table import RegionTable, region_table
 
 __all__ = ["alphabet", "nations", "common_surnames", "common_name_chars", 
-           "province_set", "city_set", "couty_set"] 
\ No newline at end of file
+           "province_set", "city_set", "couty_set", "RegionTable", "region_table"] 
\ No newline at end of file
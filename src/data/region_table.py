@@ -0,0 +1,100 @@
+# -*- coding: UTF-8 -*-
+"""
+地区表模块
+
+将 province_set / city_set / couty_set 三级地址数据展平为叶子表，
+每行对应一个可抽取的地区（有区县的城市展开到区县，否则停在城市级），
+并预先构建别名表(alias table)，一次向量化抽样即可得到N条完整地址和地区码。
+"""
+
+import numpy as np
+from .address_set import province_set, city_set, couty_set
+
+
+class RegionTable:
+    """展平后的地区叶子表
+
+    抽样权重按层级均匀：省份均匀、省内城市均匀、市内区县均匀，
+    与逐级 random.sample 的分布一致，且所有区县均可被抽到。
+    """
+
+    def __init__(self, provinces=province_set, cities=city_set, counties=couty_set, max_addr_len=20):
+        rows = []
+        weights = []
+        for province in provinces:
+            city_list = cities.get(province[0], [])
+            if not city_list:
+                rows.append((province[0], u'', u'', province[1]))
+                weights.append(1.0 / len(provinces))
+                continue
+            for city in city_list:
+                city_weight = 1.0 / len(provinces) / len(city_list)
+                county_list = counties.get(city[0], [])
+                if not county_list:
+                    rows.append((province[0], city[0], u'', city[1]))
+                    weights.append(city_weight)
+                    continue
+                for county in county_list:
+                    rows.append((province[0], city[0], county[0], county[1]))
+                    weights.append(city_weight / len(county_list))
+
+        self.provinces = np.array([row[0] for row in rows])
+        self.cities = np.array([row[1] for row in rows])
+        self.counties = np.array([row[2] for row in rows])
+        self.codes = np.array([row[3] for row in rows], dtype=np.int64)
+        self.addrs = np.array([(row[0] + row[1] + row[2])[:max_addr_len] for row in rows])
+        self.weights = np.array(weights) / np.sum(weights)
+        self.prob, self.alias = self._build_alias(self.weights)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @staticmethod
+    def _build_alias(weights):
+        """Vose别名法：构建概率表与别名表，使单次抽样为O(1)"""
+        n = len(weights)
+        scaled = weights * n
+        prob = np.ones(n)
+        alias = np.arange(n, dtype=np.int64)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        return prob, alias
+
+    def sample(self, amount, rng):
+        """按权重抽取amount个叶子行号"""
+        idx = rng.integers(0, len(self.codes), amount)
+        keep = rng.random(amount) < self.prob[idx]
+        return np.where(keep, idx, self.alias[idx])
+
+    def draw(self, amount, rng):
+        """抽取amount条地址及6位地区码
+
+        只有4位代码的城市（无区县数据）补2位互不相同的随机数字，
+        只有2位代码的省份补4位。
+
+        Returns:
+            (addr, region): 地址字符串数组和6位地区码整数数组
+        """
+        idx = self.sample(amount, rng)
+        region = self.codes[idx]
+        pad = rng.random((amount, 10)).argsort(axis=1)[:, :4]
+        city_level = (region >= 1000) & (region < 10000)
+        province_level = region < 100
+        region[city_level] = region[city_level] * 100 + pad[city_level, 0] * 10 + pad[city_level, 1]
+        region[province_level] = (region[province_level] * 10000 + pad[province_level, 0] * 1000
+                                  + pad[province_level, 1] * 100 + pad[province_level, 2] * 10
+                                  + pad[province_level, 3])
+        return self.addrs[idx], region
+
+
+region_table = RegionTable()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+
+渲染相关的测试需要 dataGenerator.base_dir 下的字体和模板（usedres 目录，
+不随仓库分发）。可以用环境变量 IDCARD_RESOURCE_DIR 指定其他资源目录；
+资源不全时跳过这些测试。
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import dataGenerator  # noqa: E402
+
+
+def _required_files():
+    files = {font_name for font_name, _ in dataGenerator.fonts.values()}
+    files.add(dataGenerator.template_name)
+    return files
+
+
+@pytest.fixture
+def resource_dir(monkeypatch):
+    """渲染资源目录；已设置到 dataGenerator.base_dir"""
+    path = os.environ.get('IDCARD_RESOURCE_DIR', dataGenerator.base_dir)
+    missing = [name for name in sorted(_required_files()) if not os.path.exists(os.path.join(path, name))]
+    if missing:
+        pytest.skip('渲染资源不全（{}），可设置 IDCARD_RESOURCE_DIR'.format(', '.join(missing)))
+    monkeypatch.setattr(dataGenerator, 'base_dir', path)
+    return path
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+渲染回归测试
+
+灰度直接绘制（render_IDcard）与原来的 RGBA 绘制后 convert('L') 相比，
+只在抗锯齿的字形边缘因取整位置不同而相差 1 个灰度级；字形图集引擎与
+ImageDraw.text 在灰度路径上逐像素一致。
+"""
+
+import os
+
+import numpy as np
+import PIL.Image as PImage
+from PIL import ImageDraw
+
+from src.core import dataGenerator
+
+SEED = 2024
+CARDS = 8
+# 允许与 RGBA 路径相差 1 个灰度级的像素比例上限（实测约 0.05%）
+MAX_DIFF_FRACTION = 0.001
+
+
+def render_rgba_reference(record):
+    """原来的渲染路径：在 RGBA 模板上以黑色绘制，再转换为灰度"""
+    im = PImage.open(os.path.join(dataGenerator.base_dir, dataGenerator.template_name)).copy()
+    draw = ImageDraw.Draw(im)
+    for xy, text, kind, _ in dataGenerator.layout_IDcard(record):
+        draw.text(xy, text, fill=(0, 0, 0), font=dataGenerator.get_font(kind))
+    return np.asarray(im.convert('L'), dtype=np.int16)
+
+
+def fixed_records():
+    return list(dataGenerator.iter_IDcard_records(CARDS, seed=SEED))
+
+
+def test_grayscale_render_matches_rgba_path(resource_dir):
+    differing = total = 0
+    for record in fixed_records():
+        expected = render_rgba_reference(record)
+        actual = np.asarray(dataGenerator.render_IDcard(record, 'pil'), dtype=np.int16)
+        assert actual.shape == expected.shape
+        diff = np.abs(actual - expected)
+        assert diff.max() <= 1
+        differing += np.count_nonzero(diff)
+        total += diff.size
+    assert differing / total <= MAX_DIFF_FRACTION
+
+
+def test_atlas_engine_matches_draw_text(resource_dir):
+    dataGenerator.warm_up_resources('atlas')
+    differing = total = 0
+    for record in fixed_records():
+        pil = np.asarray(dataGenerator.render_IDcard(record, 'pil'))
+        atlas = np.asarray(dataGenerator.render_IDcard(record, 'atlas'))
+        np.testing.assert_array_equal(atlas, pil)
+        diff = np.abs(atlas.astype(np.int16) - render_rgba_reference(record))
+        assert diff.max() <= 1
+        differing += np.count_nonzero(diff)
+        total += diff.size
+    assert differing / total <= MAX_DIFF_FRACTION
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+中断续跑测试
+
+写入阶段在若干样本后抛出异常模拟中断，再以 resume=True 从运行目录的
+检查点续跑；三种输出方式的结果都应与一次完成的运行逐字节一致。批次
+大小与分片大小互不整除，检查点会跨越 tar 分片边界和散文件子目录边界。
+"""
+
+import os
+
+import lmdb
+import pytest
+
+from src.core import dataGenerator, sinks
+
+PARAMS = {'sample_sum': 25, 'fragment_IDcard': True, 'batch_size': 10, 'seed': 123, 'codec': 'npy',
+          'shard_size': 7, 'files_per_dir': 4}
+# 中断前写入的样本数（第一个批次之后、第二个批次中途）
+CRASH_AFTER = 70
+SINK_CLASSES = {'files': sinks.DirectorySink, 'lmdb': sinks.LmdbSink, 'tar': sinks.TarShardSink}
+
+
+def generate(root, output, resume=False):
+    dataGenerator.main(output=output, output_dir=os.path.join(root, 'data'), lmdb_path=os.path.join(root, 'lmdb'),
+                       shard_dir=os.path.join(root, 'shards'), run_dir=os.path.join(root, 'run'), resume=resume,
+                       **PARAMS)
+
+
+def read_output(root, output):
+    """输出内容：LMDB 的全部键值，或输出目录中各文件的字节"""
+    if output == 'lmdb':
+        env = lmdb.open(os.path.join(root, 'lmdb'), readonly=True, lock=False)
+        try:
+            with env.begin() as txn:
+                return list(txn.cursor())
+        finally:
+            env.close()
+    top = os.path.join(root, 'shards' if output == 'tar' else 'data')
+    contents = {}
+    for dir_path, _, file_names in os.walk(top):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            with open(path, 'rb') as f:
+                contents[os.path.relpath(path, top)] = f.read()
+    return contents
+
+
+@pytest.mark.parametrize('output', sorted(SINK_CLASSES))
+def test_resume_after_crash_matches_single_run(resource_dir, tmp_path, monkeypatch, output):
+    monkeypatch.chdir(tmp_path)
+    expected_root, resumed_root = str(tmp_path / 'expected'), str(tmp_path / 'resumed')
+    generate(expected_root, output)
+
+    sink_class = SINK_CLASSES[output]
+    add = sink_class.add
+    written = [0]
+
+    def crashing_add(self, *args):
+        if written[0] >= CRASH_AFTER:
+            raise RuntimeError('simulated crash')
+        written[0] += 1
+        add(self, *args)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sink_class, 'add', crashing_add)
+        with pytest.raises(RuntimeError, match='simulated crash'):
+            generate(resumed_root, output)
+    assert written[0] == CRASH_AFTER
+
+    generate(resumed_root, output, resume=True)
+    assert read_output(resumed_root, output) == read_output(expected_root, output)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+tar 分片读写测试
+"""
+
+from src.core.sinks import TarShardSink, iter_tar_shards, list_tar_shards
+
+SAMPLES = [('{}_name.png'.format(i), bytes([i]) * (i + 1), '标注{}'.format(i)) for i in range(5)]
+
+
+def write_shards(shard_dir):
+    with TarShardSink(str(shard_dir), shard_size=2) as sink:
+        for sample in SAMPLES:
+            sink.add(*sample)
+    return list_tar_shards(str(shard_dir))
+
+
+def test_iter_tar_shards_accepts_dir_list_and_single_path(tmp_path):
+    shards = write_shards(tmp_path)
+    assert len(shards) == 3
+    expected = [(file_name[:-4], file_name, data, label) for file_name, data, label in SAMPLES]
+    assert list(iter_tar_shards(str(tmp_path))) == expected
+    assert list(iter_tar_shards(shards)) == expected
+    assert list(iter_tar_shards(shards[0])) == expected[:2]